@@ -0,0 +1,543 @@
+import asyncio
+import base64
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+import openai
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+
+# The async server shares the database helpers, caches and indexes with the Flask app
+import main
+from persistence import ArticleWriter
+from storage import read_article_body
+from entity_index import top_entities_for_user, articles_for_entity, cooccurring_entities
+from perplexity import call_perplexity_async
+from prompt_layout import build_article_messages, flatten_messages
+from token_budget import token_budgets_error
+from router import AsyncBackendRouter, new_batch, routing_policy_from_settings
+from near_duplicates import simhash, hamming_distance, MAX_DISTANCE
+from responses import COMPRESS_MIN_SIZE
+
+# Rows of one /generate-article call generated concurrently
+ROW_CONCURRENCY = int(os.getenv("ASYNC_ROW_CONCURRENCY", "8"))
+# Outbound connections shared by every request in the process
+MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "500"))
+# Threads for spaCy, bcrypt and HTML parsing
+CPU_WORKERS = int(os.getenv("ASYNC_CPU_WORKERS", str(os.cpu_count() or 4)))
+PROVIDER_TIMEOUT = float(os.getenv("ASYNC_PROVIDER_TIMEOUT", "300"))
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+http_client = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    await run_in_threadpool(main.init_db)
+    http_client = httpx.AsyncClient(
+        timeout=PROVIDER_TIMEOUT,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+    )
+    yield
+    await http_client.aclose()
+    cpu_executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+
+# CPU-heavy work (spaCy, bcrypt, HTML parsing, SimHash) never runs on the event loop
+async def run_cpu(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, func, *args)
+
+
+# Short blocking SQLite and file calls go to Starlette's thread pool
+async def run_io(func, *args):
+    return await run_in_threadpool(func, *args)
+
+
+def error(message, status_code, key="message"):
+    return ORJSONResponse({key: message}, status_code=status_code)
+
+
+# OpenAI REST calls over the shared client, honouring openai.api_base and api_key
+async def openai_post(path, payload):
+    response = await http_client.post(
+        f"{openai.api_base.rstrip('/')}{path}",
+        json=payload,
+        headers={"Authorization": f"Bearer {openai.api_key or os.getenv('OPENAI_API_KEY', '')}"},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def chat_completion(messages, **params):
+    return await openai_post("/chat/completions", {"model": "gpt-4o", "messages": messages, **params})
+
+
+async def scrape_url_content(url):
+    try:
+        response = await http_client.get(url, headers=main.SCRAPE_HEADERS, timeout=10, follow_redirects=True)
+        response.raise_for_status()
+        return await run_cpu(main.extract_page_text, response.text)
+    except Exception as e:
+        print(f"Error scraping URL: {e}")
+        return None
+
+
+# Async counterpart of main.generate_article
+async def generate_article(input_data):
+    try:
+        reference_content = ""
+        if input_data.get("inbound_link"):
+            scraped_content = await scrape_url_content(input_data["inbound_link"])
+            if scraped_content:
+                reference_content = scraped_content
+
+        messages = build_article_messages(input_data, reference_content)
+
+        if input_data.get("model") == "gpt":
+            response = await chat_completion(messages, temperature=0.7)
+            main.prompt_cache_stats.record(response.get("usage"))
+            return response["choices"][0]["message"]["content"].strip()
+        else:  # llama model
+            response = await call_perplexity_async(flatten_messages(messages), http_client)
+            main.prompt_cache_stats.record(response.get("usage"))
+            outbound_links = "\nArticle generated with the following citations: \n" + "\n".join(response['citations'])
+            article_text = response['choices'][0]['message']['content']
+            return article_text + outbound_links
+
+    except Exception as e:
+        print(f"Error generating article: {e}")
+        return "Failed to generate article"
+
+
+# Backend wrapper for the router: run generate_article on a fixed model and surface failures
+def routed_backend(model):
+    async def run(input_data):
+        article = await generate_article({**input_data, "model": model})
+        if article == "Failed to generate article":
+            raise RuntimeError(f"{model} backend failed to generate article")
+        return article
+    return run
+
+
+# Hedging and failover as asyncio tasks, so routed rows never occupy a thread
+article_router = AsyncBackendRouter({
+    "gpt": routed_backend("gpt"),
+    "perplexity": routed_backend("perplexity"),
+})
+
+
+async def generate_article_perplexity(input_data):
+    try:
+        response = await call_perplexity_async(main.perplexity_prompt(input_data), http_client)
+        return main.perplexity_article_text(response) or "Failed to generate article with Perplexity"
+    except Exception as e:
+        print(f"Error generating article: {e}")
+        return "Failed to generate article with Perplexity"
+
+
+async def generate_meta_title(article_content):
+    prompt = f"Create a concise and descriptive meta title for an image that illustrates the main theme of the following article:\n\n{article_content[:500]}...\n\nMeta title:"
+    response = await chat_completion(
+        [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": prompt}],
+        max_tokens=10,
+        temperature=0.5,
+    )
+    return response["choices"][0]["message"]["content"].strip()
+
+
+async def generate_image(prompt):
+    try:
+        response = await openai_post("/images/generations", {"prompt": prompt, "n": 1, "size": "512x512"})
+        image_response = await http_client.get(response['data'][0]['url'])
+        if image_response.status_code == 200:
+            base64_image = base64.b64encode(image_response.content).decode('utf-8')
+            return await run_io(main.save_base64_image, base64_image)
+        return None
+    except Exception as e:
+        print(f"Error generating image: {e}")
+        return None
+
+
+async def generate_entities(answer):
+    data = {"title": answer["question"], "text": answer["raw_text"] if answer["has_answer"] else ""}
+    response = await chat_completion([
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": main.get_entities_template(data)},
+    ])
+    return response["choices"][0]["message"]["content"].strip()
+
+
+@app.get("/images/{filename:path}")
+async def serve_image(filename: str):
+    filepath = os.path.normpath(os.path.join(main.UPLOAD_FOLDER, filename))
+    if not filepath.startswith(main.UPLOAD_FOLDER + os.sep) or not os.path.isfile(filepath):
+        return error("Image not found", 404, key="error")
+    return FileResponse(filepath)
+
+
+@app.post("/login")
+async def login(request: Request):
+    data = await request.json()
+    username = data.get("username")
+    password = data.get("password")
+
+    if not username or not password:
+        return error("Username and password are required", 400)
+
+    if await run_cpu(main.check_user, username, password):
+        return ORJSONResponse({"message": "Login successful!"}, status_code=200)
+    return error("Invalid username or password", 401)
+
+
+@app.post("/register")
+async def register(request: Request):
+    data = await request.json()
+    username = data.get("username")
+    password = data.get("password")
+
+    if not username or not password:
+        return error("Username and password are required", 400)
+
+    if await run_cpu(main.add_user, username, password):
+        return ORJSONResponse({"message": "Registration successful!"}, status_code=201)
+    return error("Username already exists", 409)
+
+
+@app.post("/generate-article")
+async def generate_prompt(request: Request):
+    writer = ArticleWriter(dedup_index=main.near_duplicate_index)
+    try:
+        data = await request.json()
+        username = data.get("username")
+        rows = data.get("rows", [])
+        settings = data.get("settings", {})
+
+        routing_enabled = bool(settings.get("routing"))
+        routing_policy = routing_policy_from_settings(settings)
+        batch = new_batch()
+
+        duplicate_action = settings.get("duplicateAction", "flag")
+        batch_fingerprints = []
+
+        if not username or not rows:
+            return error("Missing required data", 400, key="error")
+
+        budgets_error = token_budgets_error(settings.get("tokenBudgets"))
+        if budgets_error:
+            return error(budgets_error, 400, key="error")
+
+        user_id = await run_io(main.get_user_id, username)
+        semaphore = asyncio.Semaphore(ROW_CONCURRENCY)
+
+        async def process_row(row_data):
+            async with semaphore:
+                input_data = main.build_input_data(row_data, settings)
+
+                backend = "perplexity" if data.get("model") == "perplexity" or input_data["model"] != "gpt" else "gpt"
+                if routing_enabled:
+                    try:
+                        article, backend = await article_router.generate(input_data, backend, routing_policy, batch)
+                    except Exception as e:
+                        print(f"Error routing article generation: {e}")
+                        article = "Failed to generate article"
+                elif data.get("model") == "perplexity":
+                    article = await generate_article_perplexity(input_data)
+                else:
+                    article = await generate_article(input_data)
+
+                duplicate_of = []
+                duplicate_in_batch = False
+                if duplicate_action != "off" and user_id and not article.startswith("Failed to generate article"):
+                    fingerprint = await run_cpu(simhash, article)
+                    duplicate_of = [article_id for article_id, _ in main.near_duplicate_index.find_fingerprint(user_id, fingerprint)]
+                    duplicate_in_batch = any(hamming_distance(fingerprint, other) <= MAX_DISTANCE for other in batch_fingerprints)
+                    batch_fingerprints.append(fingerprint)
+
+                if duplicate_action == "skip" and (duplicate_of or duplicate_in_batch):
+                    return {
+                        "title": row_data["title"],
+                        "article": article,
+                        "entities": [],
+                        "image_url": None,
+                        "backend": backend,
+                        "duplicate_of": duplicate_of,
+                        "duplicate_in_batch": duplicate_in_batch,
+                        "skipped": True
+                    }
+
+                entities = await run_cpu(main.extract_top_entities, article)
+
+                image_filename = None
+                meta_title = None
+                if input_data["generate_image"]:
+                    image_prompt = f"Create an image related to the topic: {input_data['title']}"
+                    try:
+                        meta_title, image_filename = await asyncio.gather(
+                            generate_meta_title(article), generate_image(image_prompt))
+                    except Exception as e:
+                        print(f"Error generating image: {e}")
+
+                await run_io(writer.add, username, article, row_data["title"], entities, image_filename, meta_title)
+
+                return {
+                    "title": row_data["title"],
+                    "article": article,
+                    "entities": entities,
+                    "image_url": f"/images/{image_filename}" if image_filename else None,
+                    "backend": backend,
+                    "duplicate_of": duplicate_of,
+                    "duplicate_in_batch": duplicate_in_batch
+                }
+
+        results = await asyncio.gather(*(process_row(row_data) for row_data in rows))
+
+        # Make sure every article is committed before reporting success
+        await run_io(writer.close)
+
+        return ORJSONResponse({"message": "Articles generated successfully!", "data": list(results)}, status_code=200)
+
+    except Exception as e:
+        print(f"Error generating articles: {e}")
+        return error(f"Error generating articles: {str(e)}", 500)
+    finally:
+        try:
+            await run_io(writer.close)
+        except Exception as e:
+            print(f"Error saving articles: {e}")
+
+
+@app.post("/update-article")
+async def update_article_api(request: Request, id: int = None):
+    input_data = await request.json()
+    username = input_data["username"]
+    new_article = input_data.get("new_article")
+    new_title = input_data.get("new_title")
+
+    user_id = await run_io(main.get_user_id, username)
+    if user_id is None:
+        return error("User not found", 404)
+
+    new_entities = await run_cpu(main.extract_top_entities, new_article or "")
+
+    if await run_io(main.update_article, user_id, id, new_article, new_title, new_entities):
+        return ORJSONResponse({"message": "Article updated successfully!", "entities": ", ".join(new_entities)})
+    return error("Error updating article", 400)
+
+
+@app.delete("/delete-article")
+async def delete_article_api(id: str = None, username: str = None):
+    try:
+        try:
+            id = int(id) if id else None
+        except ValueError:
+            return error("Invalid article ID format", 400)
+
+        if id is None or username is None:
+            return error("Missing required parameters. Both 'id' and 'username' are required.", 400)
+
+        user_id = await run_io(main.get_user_id, username)
+        if user_id is None:
+            return error(f"User '{username}' not found", 404)
+
+        if not await run_io(main.article_exists, user_id, id):
+            return error(f"Article with id {id} not found or already deleted", 404)
+
+        if await run_io(main.delete_article, user_id, id):
+            return ORJSONResponse({"message": "Article deleted successfully", "article_id": id})
+        return error("Failed to delete article. Please try again.", 500)
+
+    except Exception as e:
+        print(f"Error in delete_article_api: {e}")
+        return error(f"Server error: {str(e)}", 500)
+
+
+def _write_download(article_id):
+    conn = sqlite3.connect("users.db")
+    try:
+        article_content = read_article_body(conn.cursor(), article_id)
+    finally:
+        conn.close()
+    if article_content is None:
+        return None
+    filepath = os.path.join("/tmp", f"article_{article_id}.txt")
+    with open(filepath, "w") as f:
+        f.write(article_content)
+    return filepath
+
+
+@app.get("/download-article")
+async def download_article(id: int = None):
+    if id is None:
+        return error("Missing 'id'", 400)
+
+    filepath = await run_io(_write_download, id)
+    if filepath is None:
+        return error("Article not found", 404)
+    return FileResponse(filepath, filename=os.path.basename(filepath))
+
+
+@app.get("/fetch-single-article")
+async def fetch_single_article(id: int = None):
+    if id is None:
+        return error("Missing 'id' parameter", 400)
+
+    article_data = await run_io(main.get_article, id)
+    if article_data is None:
+        return error("Article not found", 404)
+    return ORJSONResponse(article_data)
+
+
+@app.get("/fetch-generated-history")
+async def fetch_generated_history(username: str = None):
+    if not username:
+        return error("Username is required", 400)
+
+    user_id = await run_io(main.get_user_id, username)
+    if user_id is None:
+        return error("User not found", 404)
+
+    articles = await run_io(main.get_user_active_articles, user_id)
+    return ORJSONResponse({"message": "Fetched active articles successfully", "data": [list(row) for row in articles]})
+
+
+@app.get("/backend-stats")
+async def backend_stats():
+    return ORJSONResponse({**article_router.snapshot(), "prompt_cache": main.prompt_cache_stats.snapshot()})
+
+
+async def _entity_query(username, query, *args):
+    def run():
+        user_id = main.get_user_id(username)
+        if not user_id:
+            return None
+        conn = sqlite3.connect("users.db")
+        try:
+            return query(conn.cursor(), user_id, *args)
+        finally:
+            conn.close()
+    return await run_io(run)
+
+
+@app.get("/entity-frequency")
+async def entity_frequency(username: str = None, limit: int = 20):
+    if not username:
+        return error("Username is required", 400)
+    entities = await _entity_query(username, top_entities_for_user, limit)
+    if entities is None:
+        return error("User not found", 404)
+    return ORJSONResponse({"message": "Fetched entity frequency successfully", "data": entities})
+
+
+@app.get("/entity-articles")
+async def entity_articles(username: str = None, entity: str = None, limit: int = 100):
+    if not username or not entity:
+        return error("Username and entity are required", 400)
+    articles = await _entity_query(username, articles_for_entity, entity, limit)
+    if articles is None:
+        return error("User not found", 404)
+    return ORJSONResponse({"message": "Fetched entity articles successfully", "data": articles})
+
+
+@app.get("/entity-cooccurrence")
+async def entity_cooccurrence(username: str = None, entity: str = None, limit: int = 20):
+    if not username or not entity:
+        return error("Username and entity are required", 400)
+    entities = await _entity_query(username, cooccurring_entities, entity, limit)
+    if entities is None:
+        return error("User not found", 404)
+    return ORJSONResponse({"message": "Fetched co-occurring entities successfully", "data": entities})
+
+
+@app.post("/get-related-questions")
+async def related_questions(request: Request):
+    input_data = await request.json()
+    main_keyword = input_data.get("main_keyword")
+    number_of_questions = input_data.get("number_of_questions")
+
+    # people_also_ask is a blocking scraper, so it runs on the thread pool
+    questions = await run_io(main.paa.get_related_questions, main_keyword, number_of_questions - 1)
+    answers = await asyncio.gather(*(run_io(main.paa.get_answer, q) for q in questions))
+    key_words = await asyncio.gather(*(generate_entities(answer) for answer in answers))
+    data = [{"question": q, "key_words": k, "answer": a} for q, k, a in zip(questions, key_words, answers)]
+    return ORJSONResponse({"message": "Successful!", "data": data})
+
+
+@app.post("/save-settings")
+async def save_settings(request: Request):
+    try:
+        data = await request.json()
+        username = data.get("username")
+        name = data.get("name")
+        settings = data.get("settings")
+
+        if not all([username, name, settings]):
+            return error("Missing required data", 400, key="error")
+
+        user_id = await run_io(main.get_user_id, username)
+        if not user_id:
+            return error("User not found", 404, key="error")
+
+        await run_io(main.save_user_settings, user_id, name, settings)
+        return ORJSONResponse({"message": "Settings saved successfully"}, status_code=200)
+
+    except Exception as e:
+        print(f"Error saving settings: {e}")
+        return error(str(e), 500, key="error")
+
+
+@app.get("/get-settings")
+async def get_settings(username: str = None):
+    try:
+        if not username:
+            return error("Username is required", 400, key="error")
+
+        user_id = await run_io(main.get_user_id, username)
+        if not user_id:
+            return error("User not found", 404, key="error")
+
+        presets = await run_io(main.get_user_settings, user_id)
+        return ORJSONResponse({"presets": presets}, status_code=200)
+
+    except Exception as e:
+        print(f"Error getting settings: {e}")
+        return error(str(e), 500, key="error")
+
+
+@app.delete("/delete-settings")
+async def delete_settings(request: Request):
+    try:
+        data = await request.json()
+        username = data.get("username")
+        preset_id = data.get("preset_id")
+
+        if not all([username, preset_id]):
+            return error("Missing required data", 400, key="error")
+
+        user_id = await run_io(main.get_user_id, username)
+        if not user_id:
+            return error("User not found", 404, key="error")
+
+        if not await run_io(main.delete_user_settings, user_id, preset_id):
+            return error("Preset not found", 404, key="error")
+        return ORJSONResponse({"message": "Settings deleted successfully"}, status_code=200)
+
+    except Exception as e:
+        print(f"Error deleting settings: {e}")
+        return error(str(e), 500, key="error")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,91 @@
+# Compare inline article storage with compressed article_bodies storage.
+# Usage: python benchmarks/bench_article_storage.py [--articles N] [--users N]
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+
+WORDS = ("content marketing search engine optimization keyword ranking audience local business "
+         "guide strategy tips customers growth traffic quality article reference city service "
+         "the and for with your that this from more best how what why when").split()
+
+SCHEMA = '''CREATE TABLE articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                article TEXT NOT NULL,
+                title TEXT NOT NULL,
+                entities TEXT,
+                image_url TEXT,
+                meta_title TEXT,
+                created_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_deleted BOOLEAN DEFAULT FALSE
+            )'''
+
+
+def fake_article(rng, words=800):
+    paragraphs = []
+    for _ in range(words // 80):
+        paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(80)).capitalize() + ".")
+    return "\n\n".join(paragraphs)
+
+
+def build_db(path, articles, users, split):
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(SCHEMA)
+    if split:
+        storage.init_article_storage(c)
+    for i in range(articles):
+        body = fake_article(rng)
+        c.execute('''INSERT INTO articles (user_id, article, title, entities)
+                     VALUES (?, ?, ?, ?)''',
+                  (i % users, "" if split else body, f"Article {i}", "Search, Content"))
+        if split:
+            storage.write_article_body(c, c.lastrowid, body)
+    conn.commit()
+    return conn
+
+
+def time_listing(conn, users, repeat=50):
+    c = conn.cursor()
+    start = time.perf_counter()
+    for i in range(repeat):
+        c.execute('''SELECT id, title, entities, created_time_ts, updated_time_ts, image_url
+                     FROM articles
+                     WHERE user_id = ? AND is_deleted = FALSE
+                     ORDER BY created_time_ts DESC''', (i % users,))
+        c.fetchall()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(articles, users):
+    report = {"articles": articles, "users": users, "codec": "zstd" if storage.zstandard else "zlib"}
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout, split in (("inline", False), ("split", True)):
+            path = os.path.join(tmp, f"{layout}.db")
+            conn = build_db(path, articles, users, split)
+            conn.execute("VACUUM")
+            report[layout] = {
+                "db_bytes": os.path.getsize(path),
+                "listing_ms": round(time_listing(conn, users), 3),
+            }
+            conn.close()
+    report["size_ratio"] = round(report["split"]["db_bytes"] / report["inline"]["db_bytes"], 3)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.articles, args.users), indent=2))
@@ -0,0 +1,254 @@
+# End-to-end benchmark: runs the Flask app against local fake providers and drives
+# /generate-article, /get-related-questions and the history endpoints at fixed
+# concurrency levels, writing a machine-readable throughput and latency report.
+# Usage: python benchmarks/bench_e2e.py --concurrency 1,4,16 --requests 32 --output e2e_report.json
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from fake_services import FakeServices, add_service_arguments, overrides_from_args  # noqa: E402
+
+USERNAME = "bench-user"
+PASSWORD = "bench-password"
+
+
+# Drop-in for the people_also_ask module backed by the fake PAA endpoints
+class FakePeopleAlsoAsk:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def _get(self, path, **params):
+        url = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return json.loads(response.read())
+
+    def get_related_questions(self, keyword, max_nb_questions=None):
+        return self._get("/paa/related", q=keyword, n=max_nb_questions or 3)
+
+    def get_answer(self, question):
+        return self._get("/paa/answer", q=question)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def request(base_url, method, path, payload=None, timeout=600):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    except Exception:
+        body = b""
+        status = 0
+    return status, body, (time.perf_counter() - start) * 1000
+
+
+def run_scenario(name, concurrency, total, make_call):
+    latencies = []
+    errors = 0
+    bytes_received = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors, bytes_received
+        status, body, latency = make_call(i)
+        with lock:
+            latencies.append(latency)
+            bytes_received += len(body)
+            if status == 0 or status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    duration = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 3) if duration else None,
+        "bytes_received": bytes_received,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 3) if latencies else None,
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Gives a uvicorn server the same shutdown() call as werkzeug's server
+class UvicornHandle:
+    def __init__(self, server):
+        self.server = server
+
+    def shutdown(self):
+        self.server.should_exit = True
+
+
+# Serve asgi.app with uvicorn in a background thread
+def start_asgi():
+    import asgi
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return UvicornHandle(server), f"http://127.0.0.1:{port}"
+
+
+def start_app(fakes, workdir, server_kind="flask"):
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["OPENAI_API_BASE"] = fakes.base_url + "/v1"
+    os.environ["PERPLEXITY_API_URL"] = fakes.base_url + "/chat/completions"
+
+    # users.db and the near-duplicate log are created relative to the working directory
+    os.chdir(workdir)
+    import openai
+    import main
+    from werkzeug.serving import make_server
+
+    openai.api_key = os.environ["OPENAI_API_KEY"]
+    openai.api_base = os.environ["OPENAI_API_BASE"]
+    main.paa = FakePeopleAlsoAsk(fakes.base_url)
+    main.init_db()
+
+    if server_kind == "asgi":
+        return start_asgi()
+
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run(args):
+    fakes = FakeServices(overrides_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    server, app_url = start_app(fakes, workdir, args.server)
+    request(app_url, "POST", "/register", {"username": USERNAME, "password": PASSWORD})
+
+    settings = {"model": args.model, "generateImage": args.generate_image, "articleSize": "medium"}
+    if args.routing:
+        settings["routing"] = True
+
+    def generate(i):
+        rows = [{"mainKeyword": f"keyword {i}-{r}", "title": f"Benchmark article {i}-{r}",
+                 "keywords": "seo, content", "inboundLink": f"{fakes.base_url}/page/{i}-{r}"}
+                for r in range(args.rows)]
+        return request(app_url, "POST", "/generate-article",
+                       {"username": USERNAME, "rows": rows, "settings": settings})
+
+    def related(i):
+        return request(app_url, "POST", "/get-related-questions",
+                       {"main_keyword": f"keyword {i}", "number_of_questions": args.questions})
+
+    def history(i):
+        return request(app_url, "GET", f"/fetch-generated-history?username={USERNAME}")
+
+    scenarios = []
+    for concurrency in args.concurrency:
+        scenarios.append(run_scenario("generate-article", concurrency, args.requests, generate))
+        scenarios.append(run_scenario("get-related-questions", concurrency, args.requests, related))
+        scenarios.append(run_scenario("fetch-generated-history", concurrency, args.requests, history))
+
+        status, body, _ = history(0)
+        ids = [row[0] for row in json.loads(body).get("data", [])] if status == 200 else []
+        if ids:
+            scenarios.append(run_scenario("fetch-single-article", concurrency, args.requests,
+                                          lambda i: request(app_url, "GET", f"/fetch-single-article?id={ids[i % len(ids)]}")))
+            scenarios.append(run_scenario("download-article", concurrency, args.requests,
+                                          lambda i: request(app_url, "GET", f"/download-article?id={ids[i % len(ids)]}")))
+
+    server.shutdown()
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "rows_per_generation": args.rows,
+            "questions": args.questions,
+            "model": args.model,
+            "generate_image": args.generate_image,
+            "routing": args.routing,
+            "server": args.server,
+            "services": fakes.server.state.config,
+        },
+        "fake_service_stats": fakes.stats(),
+        "scenarios": scenarios,
+    }
+    fakes.stop()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,4,16",
+                        type=lambda s: [int(c) for c in s.split(",")])
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario and concurrency level")
+    parser.add_argument("--rows", type=int, default=3, help="rows per /generate-article call")
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--model", default="gpt", choices=["gpt", "perplexity"])
+    parser.add_argument("--generate-image", action="store_true")
+    parser.add_argument("--routing", action="store_true", help="enable hedged routing between backends")
+    parser.add_argument("--server", default="flask", choices=["flask", "asgi"], help="serve main.py or asgi.py")
+    parser.add_argument("--output", default="e2e_report.json")
+    add_service_arguments(parser)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    report = run(args)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps([{**{k: s[k] for k in ("scenario", "concurrency", "throughput_rps", "errors")},
+                       "p95_ms": s["latency_ms"]["p95"]} for s in report["scenarios"]], indent=2))
+    print(f"Report written to {output}")
@@ -0,0 +1,93 @@
+# Compare full-article NER with paragraph-cached NER on an edit-heavy workload.
+# Usage: python benchmarks/bench_incremental_entities.py [--articles N] [--edits N] [--paragraphs N]
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from incremental_ner import ParagraphEntityCache, split_paragraphs, top_entities  # noqa: E402
+
+PLACES = ["Austin", "Denver", "Chicago", "Seattle", "Boston", "Portland", "Phoenix", "Atlanta"]
+BRANDS = ["Google", "Microsoft", "Amazon", "Shopify", "HubSpot", "Semrush"]
+FILLER = ("local businesses can improve their search visibility by publishing helpful content "
+          "that answers real customer questions and earns links from trusted sites").split()
+
+
+def load_nlp():
+    try:
+        import spacy
+        return spacy.load("en_core_web_sm"), "spacy"
+    except (ImportError, OSError):
+        return RegexNLP(), "regex"
+
+
+# Stand-in NER used when spaCy is not installed: capitalized words are entities
+class RegexNLP:
+    class Doc:
+        class Ent:
+            def __init__(self, text):
+                self.text = text
+
+        def __init__(self, text):
+            self.ents = [self.Ent(m) for m in re.findall(r"\b[A-Z][a-z]{3,}\b", text)]
+
+    def __call__(self, text):
+        return self.Doc(text)
+
+    def pipe(self, texts):
+        return (self.Doc(text) for text in texts)
+
+
+def fake_paragraph(rng):
+    words = [rng.choice(FILLER) for _ in range(60)]
+    for _ in range(3):
+        words[rng.randrange(len(words))] = rng.choice(PLACES + BRANDS)
+    return " ".join(words).capitalize() + "."
+
+
+def run(articles, edits, paragraphs):
+    nlp, nlp_name = load_nlp()
+    rng = random.Random(7)
+    corpus = [[fake_paragraph(rng) for _ in range(paragraphs)] for _ in range(articles)]
+    workload = []
+    for _ in range(edits):
+        i = rng.randrange(articles)
+        corpus[i][rng.randrange(paragraphs)] = fake_paragraph(rng)
+        workload.append("\n\n".join(corpus[i]))
+
+    start = time.perf_counter()
+    full = [top_entities(Counter(ent.text for ent in nlp(text).ents)) for text in workload]
+    full_s = time.perf_counter() - start
+
+    cache = ParagraphEntityCache(nlp)
+    start = time.perf_counter()
+    incremental = [top_entities(cache.count_entities(text)) for text in workload]
+    incremental_s = time.perf_counter() - start
+
+    agreement = sum(set(a) == set(b) for a, b in zip(full, incremental)) / len(workload)
+    return {
+        "nlp": nlp_name,
+        "articles": articles,
+        "edits": edits,
+        "paragraphs_per_article": paragraphs,
+        "full_ms_per_save": round(full_s * 1000 / edits, 3),
+        "incremental_ms_per_save": round(incremental_s * 1000 / edits, 3),
+        "speedup": round(full_s / incremental_s, 2) if incremental_s else None,
+        "top10_agreement": round(agreement, 3),
+        "cache": cache.stats(),
+        "avg_paragraphs": sum(len(split_paragraphs(t)) for t in workload) / len(workload),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=15)
+    args = parser.parse_args()
+    print(json.dumps(run(args.articles, args.edits, args.paragraphs), indent=2))
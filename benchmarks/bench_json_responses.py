@@ -0,0 +1,102 @@
+# Compare stdlib json with orjson for article-heavy responses, and the bytes and CPU
+# spent by gzip/brotli compression on them.
+# Usage: python benchmarks/bench_json_responses.py [--rows N] [--history N] [--repeat N]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses  # noqa: E402
+
+WORDS = ("content marketing search engine optimization keyword ranking audience local business "
+         "guide strategy tips customers growth traffic quality article reference city service "
+         "the and for with your that this from more best how what why when").split()
+
+
+def fake_article(rng, words=1200):
+    paragraphs = []
+    for _ in range(words // 80):
+        paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(80)).capitalize() + ".")
+    return "\n\n".join(paragraphs)
+
+
+# Same shape as a /generate-article success response
+def batch_payload(rng, rows):
+    data = []
+    for i in range(rows):
+        data.append({
+            "article": fake_article(rng),
+            "title": f"Benchmark article {i}",
+            "entities": [["Search", 12], ["Content", 9], ["Local Business", 4]],
+            "image_url": f"/images/{i:08x}.png",
+            "meta_title": f"Benchmark article {i} | Guide",
+            "backend": "gpt",
+            "duplicate_of": None,
+            "duplicate_in_batch": None,
+        })
+    return {"message": "Articles generated successfully!", "data": data}
+
+
+# Same shape as /fetch-generated-history: rows of tuples from sqlite
+def history_payload(rows):
+    data = [(i, f"Benchmark article {i}", "Search, Content, Local Business",
+             "2024-10-01 12:00:00", "2024-10-01 12:00:00", f"/images/{i:08x}.png") for i in range(rows)]
+    return {"message": "Successful!", "data": data}
+
+
+def cpu_ms(func, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = func()
+    return (time.process_time() - start) * 1000 / repeat, result
+
+
+def measure(payload, repeat):
+    stdlib_ms, stdlib_body = cpu_ms(lambda: json.dumps(payload).encode("utf-8"), repeat)
+    orjson_ms, body = cpu_ms(lambda: responses.dumps_bytes(payload), repeat)
+    report = {
+        "stdlib_json": {"cpu_ms": round(stdlib_ms, 3), "bytes": len(stdlib_body)},
+        "orjson": {"cpu_ms": round(orjson_ms, 3), "bytes": len(body)},
+        "serialize_speedup": round(stdlib_ms / orjson_ms, 2) if orjson_ms else None,
+    }
+    encodings = ["gzip"] + (["br"] if responses.brotli is not None else [])
+    for encoding in encodings:
+        ms, compressed = cpu_ms(lambda: responses.compress(body, encoding), repeat)
+        report[encoding] = {
+            "cpu_ms": round(ms, 3),
+            "bytes": len(compressed),
+            "bytes_saved": len(body) - len(compressed),
+            "ratio": round(len(compressed) / len(body), 3),
+        }
+    return report
+
+
+def measure_settings(repeat):
+    settings = json.dumps({"model": "gpt", "articleSize": "medium", "toneOfVoice": "Custom",
+                           "customToneData": fake_article(random.Random(7), 400), "toc": True})
+    json_ms, _ = cpu_ms(lambda: json.loads(settings), repeat)
+    orjson_ms, _ = cpu_ms(lambda: responses.parse_settings(settings), repeat)
+    return {"json_loads_us": round(json_ms * 1000, 3), "parse_settings_us": round(orjson_ms * 1000, 3)}
+
+
+def run(rows, history, repeat):
+    rng = random.Random(42)
+    return {
+        "brotli_available": responses.brotli is not None,
+        "compress_min_size": responses.COMPRESS_MIN_SIZE,
+        "generate_article": {"rows": rows, **measure(batch_payload(rng, rows), repeat)},
+        "generated_history": {"rows": history, **measure(history_payload(history), repeat)},
+        "settings_parse": measure_settings(repeat * 100),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50, help="articles in the /generate-article response")
+    parser.add_argument("--history", type=int, default=5000, help="rows in the history response")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.history, args.repeat), indent=2))
@@ -0,0 +1,83 @@
+# Measure SimHash index build time, lookup latency and log size as the corpus grows.
+# Usage: python benchmarks/bench_near_duplicates.py [--sizes 10000,100000,1000000] [--lookups N]
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from near_duplicates import SimHashIndex, simhash  # noqa: E402
+
+WORDS = ("search content ranking local guide customers traffic service quality article city "
+         "business growth strategy tips audience keyword links trusted helpful").split()
+
+
+def fake_article(rng, words=600):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def run_size(size, lookups, users, rng):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.simhash")
+        index = SimHashIndex(path)
+
+        # Random fingerprints stand in for stored articles; hashing is timed separately
+        start = time.perf_counter()
+        chunk = 10000
+        for base in range(0, size, chunk):
+            records = [(i, i % users, rng.getrandbits(64), True) for i in range(base, min(size, base + chunk))]
+            with index.lock:
+                for article_id, user_id, fingerprint, _ in records:
+                    index._insert(article_id, user_id, fingerprint)
+                index._append(records)
+        build_s = time.perf_counter() - start
+
+        probes = [(rng.randrange(size), rng.randrange(4)) for _ in range(lookups)]
+        start = time.perf_counter()
+        found = 0
+        for article_id, flips in probes:
+            user_id, fingerprint = index.fingerprints[article_id]
+            for bit in rng.sample(range(64), flips):
+                fingerprint ^= 1 << bit
+            found += any(a == article_id for a, _ in index.find_fingerprint(user_id, fingerprint))
+        lookup_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reloaded = SimHashIndex(path)
+        reload_s = time.perf_counter() - start
+
+        return {
+            "articles": size,
+            "build_s": round(build_s, 3),
+            "lookup_us": round(lookup_s * 1e6 / lookups, 2),
+            "recall_within_3_bits": round(found / lookups, 4),
+            "reload_s": round(reload_s, 3),
+            "log_bytes": os.path.getsize(path),
+            "reloaded_articles": len(reloaded),
+        }
+
+
+def run(sizes, lookups, users):
+    rng = random.Random(11)
+    texts = [fake_article(rng) for _ in range(200)]
+    start = time.perf_counter()
+    for text in texts:
+        simhash(text)
+    fingerprint_ms = (time.perf_counter() - start) * 1000 / len(texts)
+    return {
+        "fingerprint_ms_per_600_words": round(fingerprint_ms, 3),
+        "results": [run_size(size, lookups, users, rng) for size in sizes],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(json.dumps(run(sizes, args.lookups, args.users), indent=2))
@@ -0,0 +1,264 @@
+# Local stand-ins for the OpenAI chat and image APIs, Perplexity, people_also_ask
+# and scraped web pages, with configurable latency, token streaming and error rates.
+# Run standalone with: python benchmarks/fake_services.py --port 8765
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SERVICES = ("openai", "images", "perplexity", "paa", "web")
+
+DEFAULT_SERVICE_CONFIG = {
+    "latency_ms": 50,      # time before the first byte
+    "jitter_ms": 10,       # uniform +/- jitter on latency_ms
+    "error_rate": 0.0,     # share of requests answered with HTTP 500
+    "tokens": 400,         # completion length for chat endpoints
+    "token_delay_ms": 0,   # per-token delay when streaming or simulating generation time
+}
+
+# 1x1 transparent PNG served as the generated image
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")
+
+WORDS = ("search engine optimization helps local businesses in Austin and Denver reach customers "
+         "through helpful content quality links Google Microsoft Amazon Shopify strategy").split()
+
+
+def service_config(overrides=None):
+    config = {name: dict(DEFAULT_SERVICE_CONFIG) for name in SERVICES}
+    for name, values in (overrides or {}).items():
+        config[name].update(values)
+    return config
+
+
+class FakeServiceState:
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(1234)
+        self.lock = threading.Lock()
+        self.requests = {name: 0 for name in SERVICES}
+        self.errors = {name: 0 for name in SERVICES}
+        self.seen_prefixes = set()
+
+    def begin(self, service):
+        config = self.config[service]
+        with self.lock:
+            self.requests[service] += 1
+            jitter = self.rng.uniform(-config["jitter_ms"], config["jitter_ms"])
+            failed = self.rng.random() < config["error_rate"]
+            if failed:
+                self.errors[service] += 1
+        time.sleep(max(0.0, config["latency_ms"] + jitter) / 1000.0)
+        return failed
+
+    # Simulate provider prompt caching: a repeated system prefix counts as cached
+    def cached_tokens(self, prefix):
+        key = hashlib.sha1(prefix.encode("utf-8")).digest()
+        with self.lock:
+            hit = key in self.seen_prefixes
+            self.seen_prefixes.add(key)
+        return (len(prefix) // 4) if hit else 0
+
+    def text(self, tokens):
+        with self.lock:
+            words = [self.rng.choice(WORDS) for _ in range(tokens)]
+        paragraphs = [" ".join(words[i:i + 60]).capitalize() + "." for i in range(0, len(words), 60)]
+        return "\n\n".join(paragraphs)
+
+    def stats(self):
+        with self.lock:
+            return {"requests": dict(self.requests), "errors": dict(self.errors)}
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, service):
+        self._send(500, {"error": {"message": f"fake {service} failure", "type": "server_error"}})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/stats":
+            return self._send(200, self.state.stats())
+        if url.path.startswith("/static/"):
+            return self._send(200, PNG_BYTES, "image/png")
+        if url.path.startswith("/page/"):
+            if self.state.begin("web"):
+                return self._error("web")
+            paragraphs = "".join(f"<p>{p}</p>" for p in self.state.text(600).split("\n\n"))
+            html = f"<html><head><title>{url.path}</title><script>var x=1;</script></head><body>{paragraphs}</body></html>"
+            return self._send(200, html.encode("utf-8"), "text/html")
+        if url.path == "/paa/related":
+            if self.state.begin("paa"):
+                return self._error("paa")
+            keyword = query.get("q", [""])[0]
+            count = int(query.get("n", ["3"])[0])
+            return self._send(200, [f"What is {keyword} question {i}?" for i in range(count)])
+        if url.path == "/paa/answer":
+            if self.state.begin("paa"):
+                return self._error("paa")
+            question = query.get("q", [""])[0]
+            return self._send(200, {"question": question, "has_answer": True, "raw_text": self.state.text(60),
+                                    "link": "http://example.com/answer"})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        payload = self._read_json()
+        if url.path == "/v1/chat/completions":
+            return self._chat("openai", payload)
+        if url.path == "/chat/completions":
+            return self._chat("perplexity", payload)
+        if url.path == "/v1/images/generations":
+            if self.state.begin("images"):
+                return self._error("images")
+            host = self.headers.get("Host")
+            return self._send(200, {"created": int(time.time()),
+                                    "data": [{"url": f"http://{host}/static/{uuid.uuid4()}.png"}]})
+        self._send(404, {"error": "not found"})
+
+    def _chat(self, service, payload):
+        if self.state.begin(service):
+            return self._error(service)
+        config = self.state.config[service]
+        messages = payload.get("messages", [])
+        prompt = "".join(m.get("content", "") for m in messages)
+        prefix = messages[0].get("content", "") if messages else ""
+        max_tokens = payload.get("max_tokens") or config["tokens"]
+        tokens = min(config["tokens"], max_tokens)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": tokens,
+            "total_tokens": len(prompt) // 4 + tokens,
+            "prompt_tokens_details": {"cached_tokens": self.state.cached_tokens(prefix)},
+        }
+
+        if payload.get("stream"):
+            return self._stream(payload, tokens, config["token_delay_ms"])
+
+        time.sleep(tokens * config["token_delay_ms"] / 1000.0)
+        body = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.state.text(tokens)}}],
+            "usage": usage,
+        }
+        if service == "perplexity":
+            body["citations"] = ["http://example.com/source-1", "http://example.com/source-2"]
+        self._send(200, body)
+
+    # Server-sent events, one token per chunk
+    def _stream(self, payload, tokens, token_delay_ms):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in self.state.text(tokens).split(" "):
+            chunk = {"object": "chat.completion.chunk", "model": payload.get("model", "fake"),
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(token_delay_ms / 1000.0)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeServices:
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), FakeServiceHandler)
+        self.server.daemon_threads = True
+        self.server.state = FakeServiceState(service_config(config))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        return self.server.state.stats()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Parse "openai=800,paa=100" style overrides for one config key
+def parse_overrides(spec, key, cast=float, overrides=None):
+    overrides = overrides if overrides is not None else {}
+    for item in filter(None, (spec or "").split(",")):
+        name, value = item.split("=")
+        names = SERVICES if name == "all" else (name,)
+        for service in names:
+            if service not in SERVICES:
+                raise ValueError(f"Unknown service: {service}")
+            overrides.setdefault(service, {})[key] = cast(value)
+    return overrides
+
+
+def add_service_arguments(parser):
+    parser.add_argument("--latency", default="", help="per-service latency in ms, e.g. openai=800,all=50")
+    parser.add_argument("--jitter", default="", help="per-service jitter in ms")
+    parser.add_argument("--error-rate", default="", help="per-service error rate, e.g. perplexity=0.05")
+    parser.add_argument("--tokens", default="", help="completion tokens per chat call")
+    parser.add_argument("--token-delay", default="", help="per-token delay in ms")
+
+
+def overrides_from_args(args):
+    overrides = {}
+    parse_overrides(args.latency, "latency_ms", float, overrides)
+    parse_overrides(args.jitter, "jitter_ms", float, overrides)
+    parse_overrides(args.error_rate, "error_rate", float, overrides)
+    parse_overrides(args.tokens, "tokens", int, overrides)
+    parse_overrides(args.token_delay, "token_delay_ms", float, overrides)
+    return overrides
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    add_service_arguments(parser)
+    args = parser.parse_args()
+    services = FakeServices(overrides_from_args(args), port=args.port).start()
+    print(f"Fake services listening on {services.base_url}")
+    try:
+        services.thread.join()
+    except KeyboardInterrupt:
+        services.stop()
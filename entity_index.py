@@ -0,0 +1,93 @@
+# Normalized article -> entity index kept alongside the articles table
+
+
+def init_entity_index(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS article_entities (
+                    article_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    entity TEXT NOT NULL,
+                    PRIMARY KEY (article_id, entity),
+                    FOREIGN KEY (article_id) REFERENCES articles(id)
+                ) WITHOUT ROWID''')
+    # Serves per-user frequency and entity -> articles lookups
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_article_entities_user_entity
+                 ON article_entities (user_id, entity, article_id)''')
+
+
+# Entities travel as lists so one containing a comma ("Austin, Texas") stays whole;
+# the ", "-joined articles.entities column is display-only
+def unique_entities(entities):
+    if isinstance(entities, str):
+        raise TypeError("entities must be a list; use parse_legacy_entities for the joined column")
+    seen = []
+    for entity in entities or []:
+        entity = str(entity).strip()
+        if entity and entity not in seen:
+            seen.append(entity)
+    return seen
+
+
+# Best-effort split of the joined column for rows written before the index existed;
+# it cannot tell a separator from a comma inside an entity
+def parse_legacy_entities(text):
+    return unique_entities((text or "").split(","))
+
+
+# Replace the indexed entities for one article
+def set_article_entities(c, article_id, user_id, entities):
+    c.execute("DELETE FROM article_entities WHERE article_id = ?", (article_id,))
+    c.executemany("INSERT INTO article_entities (article_id, user_id, entity) VALUES (?, ?, ?)",
+                  [(article_id, user_id, entity) for entity in unique_entities(entities)])
+
+
+def remove_article_entities(c, article_id):
+    c.execute("DELETE FROM article_entities WHERE article_id = ?", (article_id,))
+
+
+# Index active articles that have no entity rows yet and drop rows left behind by
+# deleted ones; safe to run repeatedly
+def backfill_entity_index(conn):
+    c = conn.cursor()
+    c.execute('''DELETE FROM article_entities
+                 WHERE article_id IN (SELECT id FROM articles WHERE is_deleted = TRUE)''')
+    c.execute('''SELECT a.id, a.user_id, a.entities FROM articles a
+                 WHERE a.is_deleted = FALSE AND a.entities IS NOT NULL AND a.entities != ''
+                 AND NOT EXISTS (SELECT 1 FROM article_entities e WHERE e.article_id = a.id)''')
+    rows = c.fetchall()
+    for article_id, user_id, entities in rows:
+        set_article_entities(c, article_id, user_id, parse_legacy_entities(entities))
+    conn.commit()
+    return len(rows)
+
+
+def top_entities_for_user(c, user_id, limit=20):
+    c.execute('''SELECT entity, COUNT(*) AS article_count
+                 FROM article_entities
+                 WHERE user_id = ?
+                 GROUP BY entity
+                 ORDER BY article_count DESC, entity
+                 LIMIT ?''', (user_id, limit))
+    return [{"entity": row[0], "article_count": row[1]} for row in c.fetchall()]
+
+
+def articles_for_entity(c, user_id, entity, limit=100):
+    c.execute('''SELECT a.id, a.title, a.created_time_ts, a.updated_time_ts, a.image_url
+                 FROM article_entities e
+                 JOIN articles a ON a.id = e.article_id
+                 WHERE e.user_id = ? AND e.entity = ?
+                 ORDER BY a.id DESC
+                 LIMIT ?''', (user_id, entity, limit))
+    return [{"id": row[0], "title": row[1], "created_time_ts": row[2],
+             "updated_time_ts": row[3], "image_url": row[4]} for row in c.fetchall()]
+
+
+def cooccurring_entities(c, user_id, entity, limit=20):
+    c.execute('''SELECT other.entity, COUNT(*) AS article_count
+                 FROM article_entities e
+                 JOIN article_entities other
+                   ON other.article_id = e.article_id AND other.entity != e.entity
+                 WHERE e.user_id = ? AND e.entity = ?
+                 GROUP BY other.entity
+                 ORDER BY article_count DESC, other.entity
+                 LIMIT ?''', (user_id, entity, limit))
+    return [{"entity": row[0], "article_count": row[1]} for row in c.fetchall()]
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+CACHE_SIZE = int(os.getenv("NER_CACHE_SIZE", "50000"))
+
+
+def split_paragraphs(text):
+    return [p.strip() for p in PARAGRAPH_SPLIT.split(text or "") if p.strip()]
+
+
+def paragraph_hash(paragraph):
+    return hashlib.blake2b(paragraph.encode("utf-8"), digest_size=16).digest()
+
+
+# Same selection rule extract_top_entities has always used: take the ten most
+# common entities, then drop short and numeric ones
+def top_entities(counts, n=10):
+    return [item[0] for item in counts.most_common(n) if (len(item[0]) > 3 and (not item[0].isnumeric()))]
+
+
+# LRU cache of NER results keyed by paragraph hash, so an edited article only
+# runs spaCy over the paragraphs that actually changed
+class ParagraphEntityCache:
+    def __init__(self, nlp, max_size=CACHE_SIZE):
+        self.nlp = nlp
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def entities_for(self, paragraphs):
+        keys = [paragraph_hash(p) for p in paragraphs]
+        results = {}
+        missing = {}
+        with self.lock:
+            for key, paragraph in zip(keys, paragraphs):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    results[key] = self.entries[key]
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = paragraph
+                    self.misses += 1
+
+        if missing:
+            # Run NER outside the lock, batching all changed paragraphs through nlp.pipe
+            docs = self.nlp.pipe(missing.values())
+            computed = {key: tuple(ent.text for ent in doc.ents) for key, doc in zip(missing, docs)}
+            results.update(computed)
+            with self.lock:
+                self.entries.update(computed)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def count_entities(self, text):
+        counts = Counter()
+        for entities in self.entities_for(split_paragraphs(text)):
+            counts.update(entities)
+        return counts
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -5,16 +5,24 @@ import openai
 import base64
 import uuid
 import requests
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
 from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import people_also_ask as paa
 import spacy
-from collections import Counter
 from datetime import datetime
 from perplexity import call_perplexity
+from router import BackendRouter, new_batch, routing_policy_from_settings
+from storage import (init_article_storage, migrate_article_bodies, ensure_compression_dictionary,
+                     read_article_body, write_article_body)
+from entity_index import (init_entity_index, backfill_entity_index, set_article_entities, remove_article_entities,
+                          top_entities_for_user, articles_for_entity, cooccurring_entities)
+from persistence import ArticleWriter
+from incremental_ner import ParagraphEntityCache, top_entities
+from near_duplicates import SimHashIndex, simhash, hamming_distance, MAX_DISTANCE
+from prompt_layout import build_article_messages, flatten_messages, tone_sample, PromptCacheStats
+from token_budget import MAX_SOURCE_CHARS, token_budgets_error
+from responses import init_responses, parse_settings
+from profiling import init_profiling, follow
 import requests
 from bs4 import BeautifulSoup
 import html2text
@@ -26,6 +34,10 @@ api_key = os.getenv("OPENAI_API_KEY")
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS
+# orjson for every JSON body, gzip/brotli for large responses
+init_responses(app)
+# Opt-in per-request profiling (X-Profile header or PROFILE_SAMPLE_RATE)
+init_profiling(app)
 
 # Configure image storage
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
@@ -35,6 +47,15 @@ if not os.path.exists(UPLOAD_FOLDER):
 # Load spaCy's English model
 nlp = spacy.load("en_core_web_sm")
 
+# Per-paragraph NER cache so edits only re-run spaCy on changed paragraphs
+entity_cache = ParagraphEntityCache(nlp)
+
+# Cached vs uncached prompt tokens reported by the providers
+prompt_cache_stats = PromptCacheStats()
+
+# SimHash index of stored articles, persisted next to users.db
+near_duplicate_index = SimHashIndex("users.simhash")
+
 def init_db():
     conn = sqlite3.connect("users.db")
     c = conn.cursor()
@@ -72,7 +93,45 @@ def init_db():
                     is_deleted BOOLEAN DEFAULT FALSE,
                     FOREIGN KEY (user_id) REFERENCES users(id)
                 )''')
+
+    # Article bodies are stored compressed in their own table
+    init_article_storage(c)
+
+    # Normalized entity index used by the entity aggregation endpoints
+    init_entity_index(c)
     conn.commit()
+
+    # Move any article text still stored inline into article_bodies
+    migrated = migrate_article_bodies(conn)
+    if migrated:
+        print(f"Migrated {migrated} article bodies to compressed storage; "
+              f"stop the server and run python storage.py --vacuum to shrink users.db")
+    # Train the zstd dictionary on first start with enough articles; python storage.py --train-dict retrains
+    try:
+        dict_id = ensure_compression_dictionary(conn)
+        if dict_id:
+            print(f"Trained compression dictionary {dict_id}")
+    except Exception as e:
+        print(f"Error training compression dictionary: {e}")
+    indexed = backfill_entity_index(conn)
+    if indexed:
+        print(f"Indexed entities for {indexed} articles")
+
+    # Reconcile the near-duplicate index with live articles: builds it on first start and
+    # catches up on writes committed before a crash but never appended to the log
+    c.execute("SELECT id, user_id FROM articles WHERE is_deleted = FALSE")
+    live = dict(c.fetchall())
+    indexed_ids = near_duplicate_index.article_ids()
+    missing = [(article_id, user_id, read_article_body(c, article_id))
+               for article_id, user_id in live.items() if article_id not in indexed_ids]
+    near_duplicate_index.add_many(missing)
+    stale = indexed_ids - live.keys()
+    for article_id in stale:
+        near_duplicate_index.remove(article_id)
+    if missing or stale:
+        print(f"Near-duplicate index: added {len(missing)} articles, removed {len(stale)}")
+    # Drop superseded records and tombstones now that the index matches the database
+    near_duplicate_index.compact()
     conn.close()
 
 # Helper function to add a new user
@@ -100,31 +159,6 @@ def check_user(username, password):
         return True
     return False
 
-def add_article(username, article, title, entities=None, image_url=None, meta_title=None):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    try:
-        # Get the user_id from the username
-        c.execute("SELECT id FROM users WHERE username = ?", (username,))
-        user = c.fetchone()
-
-        if user is None:
-            return False  # User not found
-
-        user_id = user[0]
-
-        # Insert the article with user_id, image_url, and meta_title
-        c.execute('''INSERT INTO articles (user_id, article, title, entities, image_url, meta_title, created_time_ts, updated_time_ts, is_deleted)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (user_id, article, title, ", ".join(entities), image_url, meta_title, datetime.now(), datetime.now(), False))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error adding article: {e}")
-        return False
-    finally:
-        conn.close()
-
 def update_article(user_id, article_id, new_article, new_title=None, new_entities=None):
     conn = sqlite3.connect("users.db")
     c = conn.cursor()
@@ -132,10 +166,21 @@ def update_article(user_id, article_id, new_article, new_title=None, new_entitie
     try:
         # Update only if user_id matches to ensure the user is authorized
         c.execute('''UPDATE articles
-                     SET article = ?, title = ?, entities = ?, updated_time_ts = ?
+                     SET article = '', title = ?, entities = ?, updated_time_ts = ?
                      WHERE id = ? AND user_id = ?''',
-                  (new_article, new_title, new_entities, datetime.now(), article_id, user_id))
+                  (new_title, ", ".join(new_entities or []), datetime.now(), article_id, user_id))
+        updated = c.rowcount
+        live = False
+        if updated:
+            write_article_body(c, article_id, new_article)
+            c.execute("SELECT is_deleted FROM articles WHERE id = ?", (article_id,))
+            live = not c.fetchone()[0]
+            # Soft-deleted articles keep the edit but stay out of the entity index
+            if live:
+                set_article_entities(c, article_id, user_id, new_entities)
         conn.commit()
+        if live:
+            near_duplicate_index.add(article_id, user_id, new_article)
         return True
     except Exception as e:
         print(f"Error updating article: {e}")
@@ -152,7 +197,12 @@ def delete_article(user_id, article_id):
                      SET is_deleted = TRUE, updated_time_ts = ?
                      WHERE id = ? AND user_id = ?''',
                   (datetime.now(), article_id, user_id))
+        deleted = c.rowcount
+        if deleted:
+            remove_article_entities(c, article_id)
         conn.commit()
+        if deleted:
+            near_duplicate_index.remove(article_id)
         return True
     except Exception as e:
         print(f"Error deleting article: {e}")
@@ -177,12 +227,41 @@ def get_user_active_articles(user_id):
     finally:
         conn.close()
 
+# Fetch a single active article with its decompressed body
+def get_article(article_id):
+    conn = sqlite3.connect("users.db")
+    conn.row_factory = sqlite3.Row  # This allows accessing columns by name
+    c = conn.cursor()
+    try:
+        c.execute("""
+            SELECT id, user_id, article, title, entities, image_url, meta_title,
+                   created_time_ts, updated_time_ts, is_deleted
+            FROM articles
+            WHERE id = ? AND is_deleted = 0
+        """, (article_id,))
+        article = c.fetchone()
+        if article is None:
+            return None
+
+        # Decompress the body only for the article being opened
+        article_data = dict(article)
+        article_data["article"] = read_article_body(c, article_id)
+        return article_data
+    finally:
+        conn.close()
+
+# Check that an article exists, belongs to the user and is not deleted
+def article_exists(user_id, article_id):
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
+    c.execute("SELECT id FROM articles WHERE id = ? AND user_id = ? AND is_deleted = FALSE", (article_id, user_id))
+    article = c.fetchone()
+    conn.close()
+    return article is not None
+
 # Entity extraction function
 def extract_top_entities(article_content):
-    doc = nlp(article_content)
-    entities = [ent.text for ent in doc.ents]
-    top_entities = [item[0] for item in Counter(entities).most_common(10) if (len(item[0]) > 3 and (not item[0].isnumeric()))]
-    return top_entities
+    return top_entities(entity_cache.count_entities(article_content))
 
 # Function to generate a meta title for the image
 def generate_meta_title(article_content):
@@ -207,97 +286,22 @@ def generate_article(input_data):
         if input_data.get("inbound_link"):
             scraped_content = scrape_url_content(input_data["inbound_link"])
             if scraped_content:
-                reference_content = f"\nReference Content: {scraped_content}\n"
-
-        # Create the prompt template with all the settings
-        prompt_template = """Write an article about {main_keyword}. 
-        Title: {title}
-        Keywords to include: {key_words}""" + reference_content + """
-        Language: {language}
-        Article Size: {article_size}
-        Tone of Voice: {tone_of_voice}
-        Point of View: {point_of_view}
-        Target Country: {target_country}
-        Target State: {target_state}
-        Target City/ZIP: {target_city_zip}
-        Content Guidelines:
-        - Write in a {tone_of_voice} tone from a {point_of_view} perspective.
-        """
-
-        if input_data.get("tone_of_voice") == "Custom" and input_data.get("custom_tone_data"):
-            prompt_template += f"""
-            Use the following text as a reference for the tone and style:
-            ---
-            {input_data['custom_tone_data']}
-            ---
-            Analyze the tone, style, and writing patterns in the above text and write the article maintaining a similar tone and style.
-            """
-        # Add prompt filtering guidelines
-        prompt_template += "\nContent Filtering Requirements:\n"
-        if input_data.get("no_harmful_content", True):
-            prompt_template += "- Ensure the content is safe and non-harmful, avoiding any content that could cause harm or distress.\n"
-        if input_data.get("no_competitor_content", False):
-            prompt_template += "- Avoid mentioning or promoting competitor products, services, or brands.\n"
-        if input_data.get("family_friendly", True):
-            prompt_template += "- Keep the content family-friendly and appropriate for all audiences.\n"
-        if input_data.get("factual_accuracy", True):
-            prompt_template += "- Ensure all information is factually accurate and well-researched. Include credible sources where applicable.\n"
-        if input_data.get("avoid_bias", True):
-            prompt_template += "- Present information objectively, avoiding any cultural, gender, or other biases.\n"
-
-        # Location targeting
-        if input_data.get("target_country") or input_data.get("target_state") or input_data.get("target_city_zip"):
-            prompt_template += "\nLocation Targeting:\n"
-            prompt_template += "- Tailor the content for the audience in {target_country}"
-            if input_data.get("target_state"):
-                prompt_template += ", {target_state}"
-            if input_data.get("target_city_zip"):
-                prompt_template += ", {target_city_zip}"
-            prompt_template += ".\n"
-
-        # Article structure options
-        options = []
-        if input_data.get("toc", False):
-            options.append("a table of contents")
-        if input_data.get("h3", False):
-            options.append("H3 headings")
-        if input_data.get("quotes", False):
-            options.append("relevant quotes")
-        if input_data.get("key_takeaways", False):
-            options.append("key takeaways")
-        if input_data.get("conclusion", False):
-            options.append("a summary")
-
-        if options:
-            prompt_template += "\nStructural Requirements:\n- Include " + ", ".join(options) + ".\n"
-
-        # Final formatting instructions
-        prompt_template += """
-            Output Format Requirements:
-            - Provide the content in plain text format, not markdown
-            - Include relevant outbound reference links where appropriate
-            - Ensure proper citation of sources and facts
-            """
-
-        # Add citation requirement for GPT model
-        if input_data.get("model") == "gpt":
-            prompt_template += "\nAlso add references that you have considered while writing the article with 'Article generated with the following citations: ' as a prefix at the end."
-
-        article_prompt = PromptTemplate(
-            input_variables=[
-                "main_keyword", "title", "key_words", "inbound_link", "language", "article_size", "tone_of_voice", "point_of_view", "target_country", 
-                "target_state", "target_city_zip", "toc", "h3", "quotes", "key_takeaways", "conclusion"
-            ],
-            template=prompt_template,
-        )
+                reference_content = scraped_content
+
+        # Static and batch-wide instructions come first so rows share a cacheable prefix
+        messages = build_article_messages(input_data, reference_content)
 
         if input_data.get("model") == "gpt":
-            llm = ChatOpenAI(temperature=0.7, model="gpt-4o")
-            article_chain = LLMChain(llm=llm, prompt=article_prompt)
-            article_text = article_chain.run(input_data)
-            return article_text
+            response = openai.ChatCompletion.create(
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.7
+            )
+            prompt_cache_stats.record(response.get("usage"))
+            return response.choices[0].message['content'].strip()
         else:  # llama model
-            response = call_perplexity(article_prompt.format(**input_data))
+            response = call_perplexity(flatten_messages(messages))
+            prompt_cache_stats.record(response.get("usage"))
             outbound_links = "\nArticle generated with the following citations: \n" + "\n".join(response['citations'])
             article_text = response['choices'][0]['message']['content']
             return article_text + outbound_links
@@ -306,8 +310,8 @@ def generate_article(input_data):
         print(f"Error generating article: {e}")
         return "Failed to generate article"
 
-# Article generation function using Perplexity
-def generate_article_perplexity(input_data):
+# Prompt used by the legacy Perplexity generation path
+def perplexity_prompt(input_data):
     prompt_template = """
     Write a comprehensive article with the following specifications:
     - Language: {language}
@@ -335,7 +339,7 @@ def generate_article_perplexity(input_data):
         prompt_template += "\n- End with a conclusion"
 
     # Format the prompt with actual values
-    prompt = prompt_template.format(
+    return prompt_template.format(
         language=input_data["language"],
         article_size=input_data["article_size"],
         title=input_data["title"],
@@ -343,18 +347,69 @@ def generate_article_perplexity(input_data):
         inbound_link=input_data["inbound_link"],
         tone_of_voice=input_data["tone_of_voice"],
         point_of_view=input_data["point_of_view"],
-        custom_tone_data=input_data.get("custom_tone_data", "")
+        custom_tone_data=tone_sample(input_data) if input_data.get("custom_tone_data") else ""
     )
 
-    # Call Perplexity API
-    response = call_perplexity(prompt)
+# Article text plus citations from a Perplexity response, or None if it has no choices
+def perplexity_article_text(response):
     if response and 'choices' in response and len(response['choices']) > 0:
         article_text = response['choices'][0]['message']['content']
         if 'citations' in response:
             outbound_links = "\nArticle generated with the following citations: \n" + "\n".join(response['citations'])
             article_text += outbound_links
         return article_text
-    return "Failed to generate article with Perplexity"
+    return None
+
+# Article generation function using Perplexity
+def generate_article_perplexity(input_data):
+    response = call_perplexity(perplexity_prompt(input_data))
+    return perplexity_article_text(response) or "Failed to generate article with Perplexity"
+
+# Map one UI row plus the batch settings onto the generation input
+def build_input_data(row_data, settings):
+    return {
+        "main_keyword": row_data.get("mainKeyword", ""),
+        "title": row_data.get("title", ""),
+        "key_words": row_data.get("keywords", ""),
+        "inbound_link": row_data.get("inboundLink", ""),
+        "language": settings.get("language", "english"),
+        "article_size": settings.get("articleSize", "short"),
+        "tone_of_voice": settings.get("toneOfVoice", "Natural"),
+        "custom_tone_data": settings.get("custom_tone_data"),
+        "point_of_view": settings.get("pointOfView", "first person"),
+        "target_country": settings.get("targetCountry", ""),
+        "target_state": settings.get("targetState", ""),
+        "target_city_zip": settings.get("targetCityZip", ""),
+        "model": settings.get("model", "gpt"),
+        "toc": settings.get("toc", False),
+        "h3": settings.get("h3", False),
+        "quotes": settings.get("quotes", False),
+        "key_takeaways": settings.get("keyTakeaways", False),
+        "conclusion": settings.get("conclusion", False),
+        "generate_image": settings.get("generateImage", False),
+        "no_harmful_content": settings.get("noHarmfulContent", True),
+        "no_competitor_content": settings.get("noCompetitorContent", True),
+        "family_friendly": settings.get("familyFriendly", True),
+        "factual_accuracy": settings.get("factualAccuracy", True),
+        "avoid_bias": settings.get("avoidBias", True),
+        "token_budgets": settings.get("tokenBudgets")
+    }
+
+# Backend wrapper for the router: run generate_article on a fixed model and surface failures
+def routed_backend(model):
+    def run(input_data):
+        article = generate_article({**input_data, "model": model})
+        if article == "Failed to generate article":
+            raise RuntimeError(f"{model} backend failed to generate article")
+        return article
+    return run
+
+# Router with live latency tracking, hedged requests and failover between GPT and Perplexity
+# Backends are wrapped with follow() so a profiled request also samples the worker threads
+article_router = BackendRouter({
+    "gpt": follow(routed_backend("gpt")),
+    "perplexity": follow(routed_backend("perplexity")),
+})
 
 # Function to save a base64 image
 def save_base64_image(base64_string):
@@ -442,6 +497,8 @@ def register():
 # API for article and image generation
 @app.route("/generate-article", methods=["POST"])
 def generate_prompt():
+    # Completed articles are buffered and written in grouped transactions
+    writer = ArticleWriter(dedup_index=near_duplicate_index)
     try:
         data = request.json
         username = data.get("username")
@@ -449,43 +506,62 @@ def generate_prompt():
         settings = data.get("settings", {})
         results = []
 
+        # Optional per-request routing across backends
+        routing_enabled = bool(settings.get("routing"))
+        routing_policy = routing_policy_from_settings(settings)
+        batch = new_batch()
+
+        # Near-duplicate handling: "flag" (default), "skip" to drop duplicates, or "off"
+        duplicate_action = settings.get("duplicateAction", "flag")
+        batch_fingerprints = []
+
         if not username or not rows:
             return jsonify({"error": "Missing required data"}), 400
 
+        budgets_error = token_budgets_error(settings.get("tokenBudgets"))
+        if budgets_error:
+            return jsonify({"error": budgets_error}), 400
+
+        user_id = get_user_id(username)
+
         for row_data in rows:
-            input_data = {
-                "main_keyword": row_data.get("mainKeyword", ""),
-                "title": row_data.get("title", ""),
-                "key_words": row_data.get("keywords", ""),
-                "inbound_link": row_data.get("inboundLink", ""),
-                "language": settings.get("language", "english"),
-                "article_size": settings.get("articleSize", "short"),
-                "tone_of_voice": settings.get("toneOfVoice", "Natural"),
-                "custom_tone_data": settings.get("custom_tone_data"),
-                "point_of_view": settings.get("pointOfView", "first person"),
-                "target_country": settings.get("targetCountry", ""),
-                "target_state": settings.get("targetState", ""),
-                "target_city_zip": settings.get("targetCityZip", ""),
-                "model": settings.get("model", "gpt"),
-                "toc": settings.get("toc", False),
-                "h3": settings.get("h3", False),
-                "quotes": settings.get("quotes", False),
-                "key_takeaways": settings.get("keyTakeaways", False),
-                "conclusion": settings.get("conclusion", False),
-                "generate_image": settings.get("generateImage", False),
-                "no_harmful_content": settings.get("noHarmfulContent", True),
-                "no_competitor_content": settings.get("noCompetitorContent", True),
-                "family_friendly": settings.get("familyFriendly", True),
-                "factual_accuracy": settings.get("factualAccuracy", True),
-                "avoid_bias": settings.get("avoidBias", True)
-            }
+            input_data = build_input_data(row_data, settings)
 
             # Choose the model based on the model parameter
-            if data.get("model") == "perplexity":
+            backend = "perplexity" if data.get("model") == "perplexity" or input_data["model"] != "gpt" else "gpt"
+            if routing_enabled:
+                try:
+                    article, backend = article_router.generate(input_data, backend, routing_policy, batch)
+                except Exception as e:
+                    print(f"Error routing article generation: {e}")
+                    article = "Failed to generate article"
+            elif data.get("model") == "perplexity":
                 article = generate_article_perplexity(input_data)
             else:  # default to GPT
                 article = generate_article(input_data)
 
+            # Check the new article against the user's stored articles and this batch
+            duplicate_of = []
+            duplicate_in_batch = False
+            if duplicate_action != "off" and user_id and not article.startswith("Failed to generate article"):
+                fingerprint = simhash(article)
+                duplicate_of = [article_id for article_id, _ in near_duplicate_index.find_fingerprint(user_id, fingerprint)]
+                duplicate_in_batch = any(hamming_distance(fingerprint, other) <= MAX_DISTANCE for other in batch_fingerprints)
+                batch_fingerprints.append(fingerprint)
+
+            if duplicate_action == "skip" and (duplicate_of or duplicate_in_batch):
+                results.append({
+                    "title": row_data["title"],
+                    "article": article,
+                    "entities": [],
+                    "image_url": None,
+                    "backend": backend,
+                    "duplicate_of": duplicate_of,
+                    "duplicate_in_batch": duplicate_in_batch,
+                    "skipped": True
+                })
+                continue
+
             # Extract entities from the generated article
             entities = extract_top_entities(article)
 
@@ -502,16 +578,22 @@ def generate_prompt():
                 except Exception as e:
                     print(f"Error generating image: {e}")
 
-            # Store the article in the database
-            add_article(username, article, row_data["title"], entities, image_filename, meta_title)
+            # Queue the article for the next grouped database write
+            writer.add(username, article, row_data["title"], entities, image_filename, meta_title)
 
             results.append({
                 "title": row_data["title"],
                 "article": article,
                 "entities": entities,
-                "image_url": f"/images/{image_filename}" if image_filename else None
+                "image_url": f"/images/{image_filename}" if image_filename else None,
+                "backend": backend,
+                "duplicate_of": duplicate_of,
+                "duplicate_in_batch": duplicate_in_batch
             })
 
+        # Make sure every article is committed before reporting success
+        writer.close()
+
         return jsonify({
             "message": "Articles generated successfully!",
             "data": results
@@ -520,6 +602,12 @@ def generate_prompt():
     except Exception as e:
         print(f"Error generating articles: {e}")
         return jsonify({"message": f"Error generating articles: {str(e)}"}), 500
+    finally:
+        # Persist completed rows even when the batch is interrupted
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"Error saving articles: {e}")
 
 @app.route("/update-article", methods=["POST"])
 def update_article_api():
@@ -528,7 +616,6 @@ def update_article_api():
     username = input_data["username"]
     new_article = input_data.get("new_article")
     new_title = input_data.get("new_title")
-    new_entities = input_data.get("new_entities")
 
     # Get user_id from username
     conn = sqlite3.connect("users.db")
@@ -542,8 +629,11 @@ def update_article_api():
 
     user_id = user[0]
 
+    # Re-extract entities server-side; unchanged paragraphs are served from the NER cache
+    new_entities = extract_top_entities(new_article or "")
+
     if update_article(user_id, article_id, new_article, new_title, new_entities):
-        return jsonify({"message": "Article updated successfully!"})
+        return jsonify({"message": "Article updated successfully!", "entities": ", ".join(new_entities)})
     else:
         return jsonify({"message": "Error updating article"}), 400
 
@@ -577,13 +667,7 @@ def delete_article_api():
         user_id = user[0]
 
         # Verify article exists and belongs to user
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-        c.execute("SELECT id FROM articles WHERE id = ? AND user_id = ? AND is_deleted = FALSE", (id, user_id))
-        article = c.fetchone()
-        conn.close()
-
-        if article is None:
+        if not article_exists(user_id, id):
             return jsonify({"message": f"Article with id {id} not found or already deleted"}), 404
 
         if delete_article(user_id, id):
@@ -606,15 +690,12 @@ def download_article():
     # Fetch article content from database
     conn = sqlite3.connect("users.db")
     c = conn.cursor()
-    c.execute("SELECT article FROM articles WHERE id = ?", (article_id,))
-    article = c.fetchone()
+    article_content = read_article_body(c, article_id)
     conn.close()
 
-    if article is None:
+    if article_content is None:
         return jsonify({"message": "Article not found"}), 404
 
-    article_content = article[0]
-
     # Create a temporary text file with the article content
     filename = f"article_{article_id}.txt"
     filepath = os.path.join("/tmp", filename)
@@ -632,28 +713,12 @@ def fetch_single_article():
     if article_id is None:
         return jsonify({"message": "Missing 'id' parameter"}), 400
 
-    # Connect to the database
-    conn = sqlite3.connect("users.db")
-    conn.row_factory = sqlite3.Row  # This allows accessing columns by name
-    c = conn.cursor()
-
-    # Fetch the article
-    c.execute("""
-        SELECT id, user_id, article, title, entities, image_url, meta_title,
-               created_time_ts, updated_time_ts, is_deleted
-        FROM articles
-        WHERE id = ? AND is_deleted = 0
-    """, (article_id,))
-    article = c.fetchone()
-
-    # Close the database connection
-    conn.close()
+    # Fetch the article and its body
+    article_data = get_article(article_id)
 
     # if article is None:
     #     return jsonify({"message": "Article not found"}), 404
 
-    # Convert the SQLite Row object to a dictionary
-    article_data = dict(article)
     # print(article_data, "\n---------------------------------------------------------------")
 
     # Parse the entities JSON string to a Python object
@@ -688,6 +753,67 @@ def fetch_generated_history():
         "data": articles
     })
 
+# API to inspect live backend latency and error rates used for routing
+@app.route("/backend-stats", methods=["GET"])
+def backend_stats():
+    return jsonify({**article_router.snapshot(), "prompt_cache": prompt_cache_stats.snapshot()})
+
+# API for a user's most frequent entities across their articles
+@app.route("/entity-frequency", methods=["GET"])
+def entity_frequency():
+    username = request.args.get("username")
+    limit = request.args.get("limit", default=20, type=int)
+    if not username:
+        return jsonify({"message": "Username is required"}), 400
+
+    user_id = get_user_id(username)
+    if not user_id:
+        return jsonify({"message": "User not found"}), 404
+
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
+    entities = top_entities_for_user(c, user_id, limit)
+    conn.close()
+    return jsonify({"message": "Fetched entity frequency successfully", "data": entities})
+
+# API for the articles that mention a given entity
+@app.route("/entity-articles", methods=["GET"])
+def entity_articles():
+    username = request.args.get("username")
+    entity = request.args.get("entity")
+    limit = request.args.get("limit", default=100, type=int)
+    if not username or not entity:
+        return jsonify({"message": "Username and entity are required"}), 400
+
+    user_id = get_user_id(username)
+    if not user_id:
+        return jsonify({"message": "User not found"}), 404
+
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
+    articles = articles_for_entity(c, user_id, entity, limit)
+    conn.close()
+    return jsonify({"message": "Fetched entity articles successfully", "data": articles})
+
+# API for entities that appear in the same articles as a given entity
+@app.route("/entity-cooccurrence", methods=["GET"])
+def entity_cooccurrence():
+    username = request.args.get("username")
+    entity = request.args.get("entity")
+    limit = request.args.get("limit", default=20, type=int)
+    if not username or not entity:
+        return jsonify({"message": "Username and entity are required"}), 400
+
+    user_id = get_user_id(username)
+    if not user_id:
+        return jsonify({"message": "User not found"}), 404
+
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
+    entities = cooccurring_entities(c, user_id, entity, limit)
+    conn.close()
+    return jsonify({"message": "Fetched co-occurring entities successfully", "data": entities})
+
 def get_entities_template(data):
     template = (
         "Can you extract the important key words from the given input text {text} or for the given title {title} of the article? "
@@ -729,41 +855,41 @@ def related_questions():
     data = [{"question": q, "key_words": generate_entities(paa.get_answer(q)), "answer": paa.get_answer(q)} for q in related_questions]
     return jsonify({"message": "Successful!", "data": data})
 
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
 def scrape_url_content(url):
     try:
         # Send a GET request to the URL
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=SCRAPE_HEADERS, timeout=10)
         response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-            
-        # Convert HTML to plain text
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.ignore_images = True
-        text = h.handle(str(soup))
-        
-        # Clean up the text
-        text = ' '.join(text.split())
-        
-        # Limit the text length to avoid token limits
-        max_chars = 2000
-        if len(text) > max_chars:
-            text = text[:max_chars] + "..."
-            
-        return text
+        return extract_page_text(response.text)
     except Exception as e:
         print(f"Error scraping URL: {e}")
         return None
 
+# Convert a fetched HTML page into the plain reference text used in prompts
+def extract_page_text(html):
+    # Parse the HTML content
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+        
+    # Convert HTML to plain text
+    h = html2text.HTML2Text()
+    h.ignore_links = True
+    h.ignore_images = True
+    text = h.handle(str(soup))
+    
+    # Clean up the text
+    text = ' '.join(text.split())
+    
+    # Bound the raw text; build_article_messages compresses it to the reference token budget
+    return text[:MAX_SOURCE_CHARS]
+
 # Helper function to get user id from username
 def get_user_id(username):
     conn = sqlite3.connect("users.db")
@@ -773,25 +899,11 @@ def get_user_id(username):
     conn.close()
     return result[0] if result else None
 
-# Save user settings preset
-@app.route("/save-settings", methods=["POST"])
-def save_settings():
+# Create or update a named settings preset for a user
+def save_user_settings(user_id, name, settings):
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
     try:
-        data = request.json
-        username = data.get("username")
-        name = data.get("name")
-        settings = data.get("settings")
-
-        if not all([username, name, settings]):
-            return jsonify({"error": "Missing required data"}), 400
-
-        user_id = get_user_id(username)
-        if not user_id:
-            return jsonify({"error": "User not found"}), 404
-
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-
         # Check if preset name already exists for this user
         c.execute("SELECT id FROM user_settings WHERE user_id = ? AND name = ? AND is_deleted = FALSE", (user_id, name))
         existing_preset = c.fetchone()
@@ -811,28 +923,14 @@ def save_settings():
             """, (user_id, name, json.dumps(settings)))
 
         conn.commit()
+    finally:
         conn.close()
 
-        return jsonify({"message": "Settings saved successfully"}), 200
-
-    except Exception as e:
-        print(f"Error saving settings: {e}")
-        return jsonify({"error": str(e)}), 500
-
-# Get user settings presets
-@app.route("/get-settings", methods=["GET"])
-def get_settings():
+# List a user's active settings presets, newest first
+def get_user_settings(user_id):
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
     try:
-        username = request.args.get("username")
-        if not username:
-            return jsonify({"error": "Username is required"}), 400
-
-        user_id = get_user_id(username)
-        if not user_id:
-            return jsonify({"error": "User not found"}), 404
-
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
         c.execute("""
             SELECT id, name, settings, created_time_ts, updated_time_ts 
             FROM user_settings 
@@ -845,12 +943,70 @@ def get_settings():
             presets.append({
                 "id": row[0],
                 "name": row[1],
-                "settings": json.loads(row[2]),
+                "settings": parse_settings(row[2]),
                 "created_time_ts": row[3],
                 "updated_time_ts": row[4]
             })
+        return presets
+    finally:
+        conn.close()
+
+# Soft delete a settings preset; returns False if it does not belong to the user
+def delete_user_settings(user_id, preset_id):
+    conn = sqlite3.connect("users.db")
+    c = conn.cursor()
+    try:
+        c.execute("""
+            UPDATE user_settings 
+            SET is_deleted = TRUE, updated_time_ts = CURRENT_TIMESTAMP 
+            WHERE id = ? AND user_id = ?
+        """, (preset_id, user_id))
 
+        if c.rowcount == 0:
+            return False
+
+        conn.commit()
+        return True
+    finally:
         conn.close()
+
+# Save user settings preset
+@app.route("/save-settings", methods=["POST"])
+def save_settings():
+    try:
+        data = request.json
+        username = data.get("username")
+        name = data.get("name")
+        settings = data.get("settings")
+
+        if not all([username, name, settings]):
+            return jsonify({"error": "Missing required data"}), 400
+
+        user_id = get_user_id(username)
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        save_user_settings(user_id, name, settings)
+
+        return jsonify({"message": "Settings saved successfully"}), 200
+
+    except Exception as e:
+        print(f"Error saving settings: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# Get user settings presets
+@app.route("/get-settings", methods=["GET"])
+def get_settings():
+    try:
+        username = request.args.get("username")
+        if not username:
+            return jsonify({"error": "Username is required"}), 400
+
+        user_id = get_user_id(username)
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        presets = get_user_settings(user_id)
         return jsonify({"presets": presets}), 200
 
     except Exception as e:
@@ -872,23 +1028,10 @@ def delete_settings():
         if not user_id:
             return jsonify({"error": "User not found"}), 404
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-
         # Soft delete the preset
-        c.execute("""
-            UPDATE user_settings 
-            SET is_deleted = TRUE, updated_time_ts = CURRENT_TIMESTAMP 
-            WHERE id = ? AND user_id = ?
-        """, (preset_id, user_id))
-
-        if c.rowcount == 0:
-            conn.close()
+        if not delete_user_settings(user_id, preset_id):
             return jsonify({"error": "Preset not found"}), 404
 
-        conn.commit()
-        conn.close()
-
         return jsonify({"message": "Settings deleted successfully"}), 200
 
     except Exception as e:
@@ -898,5 +1041,3 @@ def delete_settings():
 if __name__ == "__main__":
     init_db()  # Initialize the database before starting the app
     app.run(debug=True)
-
-crypt people-also-ask
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+from collections import defaultdict
+
+# Fingerprints are 64-bit SimHashes split into 4 bands of 16 bits. Two fingerprints
+# within MAX_DISTANCE bits of each other always agree on at least one band, so a
+# lookup only has to compare against the articles sharing a band.
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_DISTANCE = 3
+SHINGLE_SIZE = 3
+
+# Append-only log record: article_id, user_id, fingerprint, live flag
+RECORD = struct.Struct("<qqQ?")
+
+WORD = re.compile(r"\w+")
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text):
+    words = WORD.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    hashes = [_hash64(s) for s in shingles]
+    threshold = len(hashes) / 2
+    fingerprint = 0
+    for bit in range(64):
+        if sum((h >> bit) & 1 for h in hashes) > threshold:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _band_keys(user_id, fingerprint):
+    return [(((user_id << 2) | band) << BAND_BITS) | ((fingerprint >> (band * BAND_BITS)) & BAND_MASK)
+            for band in range(BANDS)]
+
+
+# SimHash LSH index over stored articles, persisted as an append-only log
+class SimHashIndex:
+    def __init__(self, path="users.simhash"):
+        self.path = path
+        self.fingerprints = {}
+        self.buckets = defaultdict(list)
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # Ignore a partially written trailing record from an interrupted append
+        usable = len(data) - len(data) % RECORD.size
+        for article_id, user_id, fingerprint, live in RECORD.iter_unpack(data[:usable]):
+            if live:
+                self._insert(article_id, user_id, fingerprint)
+            else:
+                self._remove(article_id)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def article_ids(self):
+        with self.lock:
+            return set(self.fingerprints)
+
+    def _insert(self, article_id, user_id, fingerprint):
+        self._remove(article_id)
+        self.fingerprints[article_id] = (user_id, fingerprint)
+        for key in _band_keys(user_id, fingerprint):
+            self.buckets[key].append(article_id)
+
+    def _remove(self, article_id):
+        entry = self.fingerprints.pop(article_id, None)
+        if entry is None:
+            return
+        for key in _band_keys(*entry):
+            bucket = self.buckets[key]
+            bucket.remove(article_id)
+            if not bucket:
+                del self.buckets[key]
+
+    def _append(self, records):
+        if not self.path:
+            return
+        with open(self.path, "ab") as f:
+            f.write(b"".join(RECORD.pack(*record) for record in records))
+
+    # Rewrite the log as one record per live article, dropping superseded records and
+    # tombstones so load() replay stays proportional to the index size. The new file
+    # replaces the old one atomically; run it while no other process appends.
+    def compact(self):
+        if not self.path:
+            return
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(RECORD.pack(article_id, user_id, fingerprint, True)
+                                 for article_id, (user_id, fingerprint) in self.fingerprints.items()))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    # Index a batch of (article_id, user_id, text) tuples
+    def add_many(self, articles):
+        records = [(article_id, user_id, simhash(text), True) for article_id, user_id, text in articles]
+        with self.lock:
+            for article_id, user_id, fingerprint, _ in records:
+                self._insert(article_id, user_id, fingerprint)
+            self._append(records)
+
+    def add(self, article_id, user_id, text):
+        self.add_many([(article_id, user_id, text)])
+
+    def remove(self, article_id):
+        with self.lock:
+            entry = self.fingerprints.get(article_id)
+            if entry is None:
+                return
+            self._remove(article_id)
+            self._append([(article_id, entry[0], entry[1], False)])
+
+    # Return [(article_id, distance)] for the user's articles within max_distance bits
+    def find_fingerprint(self, user_id, fingerprint, max_distance=MAX_DISTANCE):
+        matches = {}
+        with self.lock:
+            for key in _band_keys(user_id, fingerprint):
+                for article_id in self.buckets.get(key, ()):
+                    if article_id not in matches:
+                        matches[article_id] = hamming_distance(fingerprint, self.fingerprints[article_id][1])
+        return sorted(((a, d) for a, d in matches.items() if d <= max_distance), key=lambda m: m[1])
+
+    def find(self, user_id, text, max_distance=MAX_DISTANCE):
+        return self.find_fingerprint(user_id, simhash(text), max_distance)
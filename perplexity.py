@@ -1,8 +1,10 @@
+import os
 import requests
 
 
-def call_perplexity(prompt):
-    url = "https://api.perplexity.ai/chat/completions"
+# URL, payload and headers for a Perplexity chat completion
+def perplexity_request(prompt):
+    url = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
 
     payload = {
         "model": "llama-3.1-sonar-small-128k-online",
@@ -32,6 +34,19 @@ def call_perplexity(prompt):
         "Content-Type": "application/json"
     }
 
+    return url, payload, headers
+
+
+def call_perplexity(prompt):
+    url, payload, headers = perplexity_request(prompt)
     response = requests.request("POST", url, json=payload, headers=headers)
 
+    return response.json()
+
+
+# Non-blocking variant for the ASGI server; client is a shared httpx.AsyncClient
+async def call_perplexity_async(prompt, client):
+    url, payload, headers = perplexity_request(prompt)
+    response = await client.post(url, json=payload, headers=headers)
+
     return response.json()
\ No newline at end of file
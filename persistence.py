@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from storage import compress_body
+from entity_index import unique_entities
+
+# Group-commit settings for bulk article writes. Buffered rows survive Python
+# exceptions (the writer is closed in a finally block) but not a crash or SIGKILL:
+# up to FLUSH_SIZE rows, or FLUSH_INTERVAL seconds of finished rows, can be lost.
+# Set ARTICLE_FLUSH_SIZE=1 to commit every row as soon as it finishes.
+FLUSH_SIZE = int(os.getenv("ARTICLE_FLUSH_SIZE", "20"))
+FLUSH_INTERVAL = float(os.getenv("ARTICLE_FLUSH_INTERVAL", "2.0"))
+
+
+# Write many articles in a single transaction; returns the number of rows written.
+# Each row is (username, article, title, entities, image_url, meta_title).
+def write_articles(rows, db_path="users.db", dedup_index=None):
+    if not rows:
+        return 0
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    c = conn.cursor()
+    try:
+        # Take the write lock up front so the ids assigned below cannot collide
+        c.execute("BEGIN IMMEDIATE")
+
+        user_ids = {}
+        for username in {row[0] for row in rows}:
+            c.execute("SELECT id FROM users WHERE username = ?", (username,))
+            user = c.fetchone()
+            if user is None:
+                print(f"Error adding article: user '{username}' not found")
+            else:
+                user_ids[username] = user[0]
+        rows = [row for row in rows if row[0] in user_ids]
+        if not rows:
+            c.execute("COMMIT")
+            return 0
+
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'articles'")
+        seq = c.fetchone()
+        c.execute("SELECT MAX(id) FROM articles")
+        max_id = c.fetchone()[0]
+        next_id = max(seq[0] if seq else 0, max_id or 0) + 1
+
+        article_rows, body_rows, entity_rows = [], [], []
+        for offset, (username, article, title, entities, image_url, meta_title) in enumerate(rows):
+            article_id = next_id + offset
+            user_id = user_ids[username]
+            now = datetime.now()
+            article_rows.append((article_id, user_id, "", title, ", ".join(entities or []),
+                                 image_url, meta_title, now, now, False))
+            body_rows.append((article_id,) + compress_body(c, article))
+            entity_rows.extend((article_id, user_id, entity) for entity in unique_entities(entities))
+
+        c.executemany('''INSERT INTO articles (id, user_id, article, title, entities, image_url, meta_title, created_time_ts, updated_time_ts, is_deleted)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', article_rows)
+        c.executemany('''INSERT INTO article_bodies (article_id, codec, dict_id, body)
+                         VALUES (?, ?, ?, ?)''', body_rows)
+        c.executemany("INSERT INTO article_entities (article_id, user_id, entity) VALUES (?, ?, ?)", entity_rows)
+        c.execute("COMMIT")
+        if dedup_index is not None:
+            # The rows are committed at this point, so an indexing failure must not trigger a retry
+            try:
+                dedup_index.add_many([(article_row[0], article_row[1], row[1]) for article_row, row in zip(article_rows, rows)])
+            except Exception as e:
+                print(f"Error indexing articles for near-duplicate detection: {e}")
+        return len(article_rows)
+    except Exception as e:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        print(f"Error adding articles: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+# Buffers completed articles and writes them in grouped transactions, flushing
+# when flush_size rows are pending or flush_interval seconds have passed.
+class ArticleWriter:
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, db_path="users.db", dedup_index=None):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.db_path = db_path
+        self.dedup_index = dedup_index
+        self.pending = []
+        self.written = 0
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def add(self, username, article, title, entities=None, image_url=None, meta_title=None):
+        with self.lock:
+            self.pending.append((username, article, title, entities, image_url, meta_title))
+            should_flush = len(self.pending) >= self.flush_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            rows, self.pending = self.pending, []
+            if not rows:
+                return 0
+            try:
+                written = write_articles(rows, self.db_path, self.dedup_index)
+            except Exception:
+                # Keep the rows so the next flush or close() retries them
+                self.pending = rows + self.pending
+                raise
+            self.written += written
+            return written
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    # Flush whatever is still buffered; call from a finally block so a batch that
+    # raises still persists every completed article (a killed process does not, see FLUSH_INTERVAL)
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        self.flush()
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
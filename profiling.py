@@ -0,0 +1,238 @@
+import contextvars
+import cProfile
+import functools
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import g, jsonify, request, send_from_directory
+
+# Requests carrying this value in X-Profile are profiled; unset disables the header and endpoints
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of ordinary traffic profiled with the low-overhead stack sampler
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+# Oldest captures are deleted past this count
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+PROFILE_EXTENSIONS = {".prof": "cprofile", ".folded": "collapsed-stacks"}
+
+# cProfile hooks the interpreter globally, so only one request can use it at a time
+_cprofile_lock = threading.Lock()
+
+# Capture of the request being handled; copied into router worker threads with the context
+_active_capture = contextvars.ContextVar("profile_capture", default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+# Samples the stacks of a set of threads on a timer and counts collapsed stacks, root first
+class StackSampler:
+    def __init__(self, thread_ids, interval=SAMPLE_INTERVAL):
+        self.thread_ids = set(thread_ids)
+        self.interval = interval
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def track_thread(self, thread_id):
+        with self._lock:
+            self.thread_ids.add(thread_id)
+
+    def untrack_thread(self, thread_id):
+        with self._lock:
+            self.thread_ids.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                thread_ids = list(self.thread_ids)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    # Brendan Gregg's folded format, readable by flamegraph.pl and speedscope
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# cProfile for the request thread; routed work in worker threads, which one profiler
+# cannot follow, is sampled into a "-workers.folded" file saved next to the .prof
+class CProfileCapture:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.workers = StackSampler(())
+
+    def track_thread(self, thread_id):
+        self.workers.track_thread(thread_id)
+
+    def untrack_thread(self, thread_id):
+        self.workers.untrack_thread(thread_id)
+
+    def start(self):
+        self.workers.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.workers.stop()
+        _cprofile_lock.release()
+
+    def dump(self, path):
+        self.profiler.dump_stats(path)
+        if self.workers.counts:
+            self.workers.dump(os.path.splitext(path)[0] + "-workers.folded")
+
+
+# Wrap work that a request hands to other threads (the router's backends) so the
+# request's capture also covers those threads; the executor must copy the context
+def follow(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        capture = _active_capture.get()
+        if capture is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        capture.track_thread(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            capture.untrack_thread(thread_id)
+    return wrapper
+
+
+def token_matches(value):
+    return bool(PROFILE_TOKEN) and bool(value) and hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+# Header-triggered requests get cProfile unless X-Profile-Mode asks for sampling
+# or another request already holds it; randomly sampled traffic always uses the sampler
+def choose_capture(header_token, mode):
+    if token_matches(header_token):
+        if mode != "sample" and _cprofile_lock.acquire(blocking=False):
+            return CProfileCapture()
+        return StackSampler([threading.get_ident()])
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return StackSampler([threading.get_ident()])
+    return None
+
+
+def profile_name(method, path, duration_ms, capture):
+    endpoint = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+    extension = ".prof" if isinstance(capture, CProfileCapture) else ".folded"
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    return f"{stamp}-{method}-{endpoint}-{int(duration_ms)}ms-{uuid.uuid4().hex[:8]}{extension}"
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    mtimes = {}
+    for name in os.listdir(PROFILE_DIR):
+        extension = os.path.splitext(name)[1]
+        if extension not in PROFILE_EXTENSIONS:
+            continue
+        stat = os.stat(os.path.join(PROFILE_DIR, name))
+        mtimes[name] = stat.st_mtime
+        profiles.append({
+            "name": name,
+            "format": PROFILE_EXTENSIONS[extension],
+            "bytes": stat.st_size,
+            "created_time_ts": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    profiles.sort(key=lambda p: mtimes[p["name"]], reverse=True)
+    return profiles
+
+
+def prune_profiles():
+    for profile in list_profiles()[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, profile["name"]))
+        except OSError:
+            pass
+
+
+def save_capture(capture, name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    capture.dump(os.path.join(PROFILE_DIR, name))
+    prune_profiles()
+
+
+def init_profiling(app):
+    @app.before_request
+    def _start_profile():
+        if request.path.startswith("/profiles"):
+            return
+        capture = choose_capture(request.headers.get("X-Profile"), request.headers.get("X-Profile-Mode"))
+        if capture is None:
+            return
+        g.profile_capture = capture
+        g.profile_started = time.perf_counter()
+        _active_capture.set(capture)
+        capture.start()
+
+    @app.after_request
+    def _stop_profile(response):
+        capture = g.pop("profile_capture", None)
+        if capture is None:
+            return response
+        _active_capture.set(None)
+        capture.stop()
+        duration_ms = (time.perf_counter() - g.pop("profile_started")) * 1000
+        name = profile_name(request.method, request.path, duration_ms, capture)
+        try:
+            save_capture(capture, name)
+            response.headers["X-Profile-Id"] = name
+        except Exception as e:
+            app.logger.warning("Could not save profile %s: %s", name, e)
+        return response
+
+    # Requests that raised skip after_request; stop their capture without saving it
+    @app.teardown_request
+    def _discard_profile(exc):
+        capture = g.pop("profile_capture", None)
+        if capture is not None:
+            _active_capture.set(None)
+            capture.stop()
+
+    @app.route('/profiles', methods=['GET'])
+    def profiles():
+        if not token_matches(request.headers.get("X-Profile")):
+            return jsonify({"message": "Not found"}), 404
+        return jsonify({"message": "Fetched profiles successfully", "data": list_profiles()}), 200
+
+    @app.route('/profiles/<name>', methods=['GET'])
+    def download_profile(name):
+        if not token_matches(request.headers.get("X-Profile")):
+            return jsonify({"message": "Not found"}), 404
+        if os.path.splitext(name)[1] not in PROFILE_EXTENSIONS:
+            return jsonify({"message": "Profile not found"}), 404
+        return send_from_directory(PROFILE_DIR, name, as_attachment=True)
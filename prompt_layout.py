@@ -0,0 +1,154 @@
+import threading
+
+from token_budget import budgets_for, count_tokens, fit_to_budget
+
+# Prompts are laid out from most to least stable so providers can reuse the cached
+# prefix: static instructions, then settings shared by the whole batch, then the
+# per-row values last. Nothing row-specific may appear before the row section.
+
+STATIC_SYSTEM_PROMPT = """You are an expert SEO content writer producing articles for bulk publication.
+Follow every requirement in the sections below exactly.
+
+Output Format Requirements:
+- Provide the content in plain text format, not markdown
+- Include relevant outbound reference links where appropriate
+- Ensure proper citation of sources and facts
+"""
+
+FILTER_GUIDELINES = [
+    ("no_harmful_content", True, "- Ensure the content is safe and non-harmful, avoiding any content that could cause harm or distress."),
+    ("no_competitor_content", False, "- Avoid mentioning or promoting competitor products, services, or brands."),
+    ("family_friendly", True, "- Keep the content family-friendly and appropriate for all audiences."),
+    ("factual_accuracy", True, "- Ensure all information is factually accurate and well-researched. Include credible sources where applicable."),
+    ("avoid_bias", True, "- Present information objectively, avoiding any cultural, gender, or other biases."),
+]
+
+STRUCTURE_OPTIONS = [
+    ("toc", "a table of contents"),
+    ("h3", "H3 headings"),
+    ("quotes", "relevant quotes"),
+    ("key_takeaways", "key takeaways"),
+    ("conclusion", "a summary"),
+]
+
+
+# Section built only from batch-wide settings, identical for every row of a batch
+def batch_section(input_data):
+    lines = [
+        "Article Settings:",
+        f"- Language: {input_data.get('language', '')}",
+        f"- Article Size: {input_data.get('article_size', '')}",
+        f"- Tone of Voice: {input_data.get('tone_of_voice', '')}",
+        f"- Point of View: {input_data.get('point_of_view', '')}",
+        f"- Target Country: {input_data.get('target_country', '')}",
+        f"- Target State: {input_data.get('target_state', '')}",
+        f"- Target City/ZIP: {input_data.get('target_city_zip', '')}",
+        "",
+        "Content Guidelines:",
+        f"- Write in a {input_data.get('tone_of_voice', '')} tone from a {input_data.get('point_of_view', '')} perspective.",
+    ]
+
+    if input_data.get("tone_of_voice") == "Custom" and input_data.get("custom_tone_data"):
+        lines += [
+            "- Use the following text as a reference for the tone and style:",
+            "---",
+            tone_sample(input_data),
+            "---",
+            "- Analyze the tone, style, and writing patterns in the above text and write the article maintaining a similar tone and style.",
+        ]
+
+    lines += ["", "Content Filtering Requirements:"]
+    lines += [text for key, default, text in FILTER_GUIDELINES if input_data.get(key, default)]
+
+    if input_data.get("target_country") or input_data.get("target_state") or input_data.get("target_city_zip"):
+        location = ", ".join(input_data[key] for key in ("target_country", "target_state", "target_city_zip")
+                             if input_data.get(key))
+        lines += ["", "Location Targeting:", f"- Tailor the content for the audience in {location}."]
+
+    options = [text for key, text in STRUCTURE_OPTIONS if input_data.get(key, False)]
+    if options:
+        lines += ["", "Structural Requirements:", "- Include " + ", ".join(options) + "."]
+
+    if input_data.get("model") == "gpt":
+        lines += ["", "Also add references that you have considered while writing the article with "
+                      "'Article generated with the following citations: ' as a prefix at the end."]
+
+    return "\n".join(lines) + "\n"
+
+
+# Custom tone sample compressed to its token allowance; deterministic, so the prefix stays stable
+def tone_sample(input_data):
+    return fit_to_budget(input_data["custom_tone_data"].strip(), budgets_for(input_data)["tone_sample"])
+
+
+# Reference allowance, reduced by however much the guidelines overrun their own allowance
+def reference_budget(input_data, prefix):
+    budgets = budgets_for(input_data)
+    guideline_tokens = count_tokens(prefix)
+    if input_data.get("tone_of_voice") == "Custom" and input_data.get("custom_tone_data"):
+        guideline_tokens -= count_tokens(tone_sample(input_data))
+    overflow = max(0, guideline_tokens - budgets["guidelines"])
+    return max(0, budgets["reference"] - overflow)
+
+
+# Everything that is shared across the rows of one batch
+def prompt_prefix(input_data):
+    return STATIC_SYSTEM_PROMPT + "\n" + batch_section(input_data)
+
+
+# Per-row values, always placed last
+def row_section(input_data, reference_content=""):
+    lines = [
+        f"Write an article about {input_data.get('main_keyword', '')}.",
+        f"Title: {input_data.get('title', '')}",
+        f"Keywords to include: {input_data.get('key_words', '')}",
+    ]
+    if reference_content:
+        lines.append(f"Reference Content: {reference_content}")
+    return "\n".join(lines) + "\n"
+
+
+def build_article_messages(input_data, reference_content=""):
+    prefix = prompt_prefix(input_data)
+    if reference_content:
+        # Keep the reference sentences most relevant to this row's keywords
+        query = " ".join(str(input_data.get(key) or "") for key in ("main_keyword", "title", "key_words"))
+        reference_content = fit_to_budget(reference_content, reference_budget(input_data, prefix), query)
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": row_section(input_data, reference_content)},
+    ]
+
+
+# Single-string form for providers that take one prompt, keeping the same order
+def flatten_messages(messages):
+    return "\n".join(message["content"] for message in messages)
+
+
+# Running totals of prompt tokens served from the provider's prompt cache
+class PromptCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage):
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+            self.cached_tokens += details.get("cached_tokens", 0) or 0
+
+    def snapshot(self):
+        with self.lock:
+            uncached = self.prompt_tokens - self.cached_tokens
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "uncached_tokens": uncached,
+                "cache_hit_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            }
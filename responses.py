@@ -0,0 +1,122 @@
+import gzip
+import os
+
+import orjson
+from flask.json.provider import JSONProvider
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/csv"}
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, sort_keys=False):
+    options = ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=_default, option=options)
+
+
+# Flask JSON provider backed by orjson; jsonify and dict returns both go through it
+class OrjsonProvider(JSONProvider):
+    sort_keys = False
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, kwargs.get("sort_keys", self.sort_keys)).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys), mimetype=self.mimetype)
+
+
+# Stored settings presets are parsed fresh on every read: orjson parses a preset in
+# about the time a copy of a cached one would take, so a cache buys nothing here
+def parse_settings(settings_text):
+    return orjson.loads(settings_text)
+
+
+def _accepted(accept_encoding):
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        pieces = part.strip().split(";")
+        name = pieces[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+# Pick br when the client accepts it and brotli is installed, else gzip, else nothing
+def choose_encoding(accept_encoding):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+# after_request hook compressing large JSON and text bodies
+def compress_response(response, accept_encoding):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_responses(app):
+    app.json_provider_class = OrjsonProvider
+    app.json = OrjsonProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        from flask import request
+        return compress_response(response, request.headers.get("Accept-Encoding", ""))
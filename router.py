@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Default routing settings, each of which can be overridden per request
+DEFAULT_ROUTING = {
+    "hedge": True,                 # send a backup request once the primary passes its p95
+    "failover": True,              # retry on the alternative backend when the primary errors
+    "hedge_delay_ms": None,        # fixed hedge delay; None means use the primary's live p95
+    "min_hedge_delay_ms": 2000,    # never hedge earlier than this
+    "max_hedge_ratio": 0.2,        # at most this share of recent calls may be hedged
+    "max_hedges_per_batch": 5,     # hard cap on extra calls for a single batch
+    "max_error_rate": 0.5,         # backends above this error rate are demoted
+}
+
+# Latency used for hedging until a backend has enough samples for a p95
+DEFAULT_HEDGE_DELAY_MS = 30000
+MIN_SAMPLES = 20
+WINDOW_SIZE = 200
+
+
+# Rolling latency and error statistics for one backend
+class BackendStats:
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.latencies = deque(maxlen=window_size)
+        self.outcomes = deque(maxlen=window_size)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms, success):
+        with self.lock:
+            if success:
+                self.latencies.append(latency_ms)
+            self.outcomes.append(success)
+
+    def percentile(self, pct):
+        with self.lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def error_rate(self):
+        with self.lock:
+            if len(self.outcomes) < MIN_SAMPLES:
+                return 0.0
+            return 1.0 - (sum(self.outcomes) / len(self.outcomes))
+
+    def snapshot(self):
+        with self.lock:
+            samples = len(self.outcomes)
+            in_flight = self.in_flight
+        return {
+            "samples": samples,
+            "in_flight": in_flight,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "error_rate": round(self.error_rate(), 4),
+        }
+
+
+# Backend choice, hedge budgeting and live statistics shared by the thread-based
+# and asyncio routers
+class RoutingCore:
+    def __init__(self, backends):
+        self.backends = backends
+        self.stats = {name: BackendStats() for name in backends}
+        self.hedge_log = deque(maxlen=WINDOW_SIZE)
+        self.lock = threading.Lock()
+
+    def _alternative(self, name):
+        for other in self.backends:
+            if other != name:
+                return other
+        return None
+
+    def _hedge_delay(self, name, policy):
+        if policy["hedge_delay_ms"] is not None:
+            return policy["hedge_delay_ms"] / 1000.0
+        p95 = self.stats[name].percentile(95)
+        if p95 is None:
+            p95 = DEFAULT_HEDGE_DELAY_MS
+        return max(p95, policy["min_hedge_delay_ms"]) / 1000.0
+
+    # Cost guardrail: claim a hedge only while the batch cap and the recent hedge ratio
+    # allow it; checked and counted under one lock since a batch's rows run concurrently
+    def _claim_hedge(self, policy, batch):
+        with self.lock:
+            if batch["hedges"] >= policy["max_hedges_per_batch"]:
+                return False
+            if self.hedge_log and sum(self.hedge_log) / len(self.hedge_log) >= policy["max_hedge_ratio"]:
+                return False
+            batch["hedges"] += 1
+            return True
+
+    # Pick the primary backend, demoting it if its live error rate is too high
+    def choose_primary(self, preferred, policy):
+        alternative = self._alternative(preferred)
+        if alternative is None or not policy["failover"]:
+            return preferred
+        if self.stats[preferred].error_rate() > policy["max_error_rate"] \
+                and self.stats[alternative].error_rate() < self.stats[preferred].error_rate():
+            return alternative
+        return preferred
+
+    def _log_hedge(self, hedged):
+        with self.lock:
+            self.hedge_log.append(1 if hedged else 0)
+
+    def snapshot(self):
+        with self.lock:
+            hedge_ratio = (sum(self.hedge_log) / len(self.hedge_log)) if self.hedge_log else 0.0
+        return {
+            "backends": {name: stats.snapshot() for name, stats in self.stats.items()},
+            "hedge_ratio": round(hedge_ratio, 4),
+        }
+
+
+# Routes generation calls between backends with hedging and failover, running each
+# call in a worker thread
+class BackendRouter(RoutingCore):
+    def __init__(self, backends, max_workers=16):
+        super().__init__(backends)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _call(self, name, input_data, started):
+        started.set()
+        stats = self.stats[name]
+        with stats.lock:
+            stats.in_flight += 1
+        start = time.monotonic()
+        try:
+            result = self.backends[name](input_data)
+        except Exception:
+            stats.record((time.monotonic() - start) * 1000, False)
+            raise
+        finally:
+            with stats.lock:
+                stats.in_flight -= 1
+        stats.record((time.monotonic() - start) * 1000, True)
+        return result
+
+    def _submit(self, name, input_data):
+        started = threading.Event()
+        # Run in a copy of the caller's context so request-scoped context variables follow the call
+        future = self.executor.submit(contextvars.copy_context().run, self._call, name, input_data, started)
+        future.backend = name
+        future.started = started
+        return future
+
+    # Generate with the preferred backend; returns (result, backend_name)
+    def generate(self, input_data, preferred, policy=None, batch=None):
+        policy = {**DEFAULT_ROUTING, **(policy or {})}
+        if batch is None:
+            batch = new_batch()
+
+        primary = self.choose_primary(preferred, policy)
+        alternative = self._alternative(primary)
+        first = self._submit(primary, input_data)
+        pending = {first}
+        hedged = False
+        last_error = None
+
+        # Time queued behind other calls is not backend latency; the hedge clock starts with the call
+        first.started.wait()
+        done, _ = wait(pending, timeout=self._hedge_delay(primary, policy))
+        if not done and policy["hedge"] and alternative and self._claim_hedge(policy, batch):
+            hedged = True
+            pending.add(self._submit(alternative, input_data))
+
+        tried = {primary, alternative} if hedged else {primary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Backend {future.backend} failed: {e}")
+                    last_error = e
+                    continue
+                self._log_hedge(hedged)
+                return result, future.backend
+
+            # Fail over once if the primary errored before a hedge was sent
+            if not pending and policy["failover"] and alternative and alternative not in tried:
+                tried.add(alternative)
+                pending = {self._submit(alternative, input_data)}
+
+        self._log_hedge(hedged)
+        raise last_error
+
+
+# Same routing for async backends: calls are tasks on the event loop, so concurrency is
+# bounded only by the caller, and a losing hedge is cancelled instead of left running
+class AsyncBackendRouter(RoutingCore):
+    async def _call(self, name, input_data):
+        stats = self.stats[name]
+        with stats.lock:
+            stats.in_flight += 1
+        start = time.monotonic()
+        try:
+            result = await self.backends[name](input_data)
+        except Exception:
+            stats.record((time.monotonic() - start) * 1000, False)
+            raise
+        finally:
+            with stats.lock:
+                stats.in_flight -= 1
+        stats.record((time.monotonic() - start) * 1000, True)
+        return result
+
+    # Generate with the preferred backend; returns (result, backend_name)
+    async def generate(self, input_data, preferred, policy=None, batch=None):
+        policy = {**DEFAULT_ROUTING, **(policy or {})}
+        if batch is None:
+            batch = new_batch()
+
+        primary = self.choose_primary(preferred, policy)
+        alternative = self._alternative(primary)
+        names = {}
+
+        def start(name):
+            task = asyncio.ensure_future(self._call(name, input_data))
+            names[task] = name
+            return task
+
+        pending = {start(primary)}
+        hedged = False
+        last_error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_delay(primary, policy))
+            if not done and policy["hedge"] and alternative and self._claim_hedge(policy, batch):
+                hedged = True
+                pending.add(start(alternative))
+
+            tried = {primary, alternative} if hedged else {primary}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"Backend {names[task]} failed: {e}")
+                        last_error = e
+                        continue
+                    self._log_hedge(hedged)
+                    return result, names[task]
+
+                # Fail over once if the primary errored before a hedge was sent
+                if not pending and policy["failover"] and alternative and alternative not in tried:
+                    tried.add(alternative)
+                    pending = {start(alternative)}
+
+            self._log_hedge(hedged)
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Per-batch counters shared by every row of one /generate-article call
+def new_batch():
+    return {"hedges": 0}
+
+
+# Map the camelCase routing settings sent by the UI onto router policy keys
+def routing_policy_from_settings(settings):
+    routing = settings.get("routing")
+    if not isinstance(routing, dict):
+        routing = {}
+    policy = {}
+    mapping = {
+        "hedge": "hedge",
+        "failover": "failover",
+        "hedgeDelayMs": "hedge_delay_ms",
+        "minHedgeDelayMs": "min_hedge_delay_ms",
+        "maxHedgeRatio": "max_hedge_ratio",
+        "maxHedgesPerBatch": "max_hedges_per_batch",
+        "maxErrorRate": "max_error_rate",
+    }
+    for key, policy_key in mapping.items():
+        if key in routing:
+            policy[policy_key] = routing[key]
+    return policy
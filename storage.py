@@ -0,0 +1,200 @@
+import argparse
+import os
+import sqlite3
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, fall back to zlib
+    zstandard = None
+
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 6
+DICT_SIZE = 32 * 1024
+DICT_MIN_SAMPLES = 50
+
+# Trained dictionaries are immutable once stored, so cache them by (database file, id);
+# ids are only unique within one database
+_dict_cache = {}
+
+
+# Create the body and dictionary tables next to the articles table
+def init_article_storage(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS article_bodies (
+                    article_id INTEGER PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    dict_id INTEGER,
+                    body BLOB NOT NULL,
+                    FOREIGN KEY (article_id) REFERENCES articles(id)
+                )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS compression_dicts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    codec TEXT NOT NULL,
+                    dict BLOB NOT NULL,
+                    created_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+
+
+def _database_path(c):
+    for _, name, path in c.connection.execute("PRAGMA database_list"):
+        if name == "main":
+            return os.path.realpath(path) if path else None
+    return None
+
+
+def _load_dict(c, dict_id):
+    # In-memory databases have no path to key on, so their dictionaries are not cached
+    path = _database_path(c)
+    key = (path, dict_id)
+    if path is None or key not in _dict_cache:
+        c.execute("SELECT dict FROM compression_dicts WHERE id = ?", (dict_id,))
+        row = c.fetchone()
+        if row is None:
+            raise ValueError(f"Compression dictionary {dict_id} not found")
+        compression_dict = zstandard.ZstdCompressionDict(bytes(row[0]))
+        if path is None:
+            return compression_dict
+        _dict_cache[key] = compression_dict
+    return _dict_cache[key]
+
+
+def _latest_dict_id(c):
+    c.execute("SELECT MAX(id) FROM compression_dicts WHERE codec = 'zstd'")
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+# Compress an article body, returning (codec, dict_id, blob)
+def compress_body(c, text):
+    data = text.encode("utf-8")
+    if zstandard is None:
+        return "zlib", None, zlib.compress(data, ZLIB_LEVEL)
+
+    dict_id = _latest_dict_id(c)
+    if dict_id is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_load_dict(c, dict_id))
+        return "zstd", dict_id, compressor.compress(data)
+    return "zstd", None, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def decompress_body(c, codec, dict_id, blob):
+    blob = bytes(blob)
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed articles")
+        if dict_id is not None:
+            decompressor = zstandard.ZstdDecompressor(dict_data=_load_dict(c, dict_id))
+        else:
+            decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(blob).decode("utf-8")
+    raise ValueError(f"Unknown article codec: {codec}")
+
+
+# Insert or replace the compressed body for an article
+def write_article_body(c, article_id, text):
+    codec, dict_id, blob = compress_body(c, text)
+    c.execute('''INSERT OR REPLACE INTO article_bodies (article_id, codec, dict_id, body)
+                 VALUES (?, ?, ?, ?)''', (article_id, codec, dict_id, blob))
+
+
+# Read an article body, falling back to the inline column for rows not yet migrated
+def read_article_body(c, article_id):
+    c.execute("SELECT codec, dict_id, body FROM article_bodies WHERE article_id = ?", (article_id,))
+    row = c.fetchone()
+    if row is not None:
+        return decompress_body(c, row[0], row[1], row[2])
+    c.execute("SELECT article FROM articles WHERE id = ?", (article_id,))
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+# Move inline article text into article_bodies in batches; safe to run repeatedly
+def migrate_article_bodies(conn, batch_size=500):
+    c = conn.cursor()
+    init_article_storage(c)
+    migrated = 0
+    while True:
+        c.execute('''SELECT a.id, a.article FROM articles a
+                     LEFT JOIN article_bodies b ON b.article_id = a.id
+                     WHERE b.article_id IS NULL AND a.article != ''
+                     LIMIT ?''', (batch_size,))
+        rows = c.fetchall()
+        if not rows:
+            break
+        for article_id, text in rows:
+            write_article_body(c, article_id, text)
+        c.executemany("UPDATE articles SET article = '' WHERE id = ?", [(row[0],) for row in rows])
+        conn.commit()
+        migrated += len(rows)
+    return migrated
+
+
+# Rebuild the database file so space freed by migrate_article_bodies is returned to
+# the filesystem; SQLite only reuses freed pages otherwise. Needs exclusive access and
+# temporary disk space about the size of the database.
+def vacuum_database(conn):
+    before = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.execute("VACUUM")
+    after = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    return before, after
+
+
+# Train a zstd dictionary from stored bodies; new writes use the latest dictionary
+def train_compression_dictionary(conn, sample_limit=2000, dict_size=DICT_SIZE):
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to train a compression dictionary")
+    c = conn.cursor()
+    c.execute('''SELECT article_id FROM article_bodies
+                 ORDER BY article_id DESC LIMIT ?''', (sample_limit,))
+    samples = [read_article_body(c, row[0]).encode("utf-8") for row in c.fetchall()]
+    if len(samples) < DICT_MIN_SAMPLES:
+        return None
+    trained = zstandard.train_dictionary(dict_size, samples)
+    c.execute("INSERT INTO compression_dicts (codec, dict) VALUES (?, ?)", ("zstd", trained.as_bytes()))
+    conn.commit()
+    return c.lastrowid
+
+
+# Train the first dictionary once enough bodies exist; later ones are trained explicitly
+def ensure_compression_dictionary(conn):
+    if zstandard is None:
+        return None
+    c = conn.cursor()
+    if _latest_dict_id(c) is not None:
+        return None
+    c.execute("SELECT COUNT(*) FROM article_bodies")
+    if c.fetchone()[0] < DICT_MIN_SAMPLES:
+        return None
+    return train_compression_dictionary(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Article body storage maintenance")
+    parser.add_argument("--db", default="users.db")
+    parser.add_argument("--train-dict", action="store_true",
+                        help="train a new zstd dictionary from the most recent article bodies")
+    parser.add_argument("--samples", type=int, default=2000, help="bodies sampled for training")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="migrate any inline bodies, then VACUUM so the file shrinks; stop the server first")
+    args = parser.parse_args()
+
+    if not args.train_dict and not args.vacuum:
+        parser.error("nothing to do; pass --train-dict and/or --vacuum")
+    if args.train_dict and zstandard is None:
+        parser.error("zstandard is not installed; dictionaries are zstd-only")
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.train_dict:
+            dict_id = train_compression_dictionary(conn, sample_limit=args.samples)
+            if dict_id is None:
+                print(f"Not enough article bodies to train a dictionary (need {DICT_MIN_SAMPLES})")
+            else:
+                print(f"Trained compression dictionary {dict_id}; new article writes will use it")
+        if args.vacuum:
+            migrated = migrate_article_bodies(conn)
+            before, after = vacuum_database(conn)
+            print(f"Migrated {migrated} article bodies; database {before} -> {after} bytes")
+    finally:
+        conn.close()
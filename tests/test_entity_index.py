@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+from entity_index import (articles_for_entity, backfill_entity_index, init_entity_index,
+                          set_article_entities, top_entities_for_user)
+from persistence import write_articles
+from storage import init_article_storage
+
+ENTITIES = ["Austin, Texas", "October 19, 2026", "Roofing"]
+
+
+def make_db():
+    conn = sqlite3.connect(":memory:")
+    c = conn.cursor()
+    c.execute('''CREATE TABLE articles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    title TEXT NOT NULL DEFAULT '',
+                    entities TEXT,
+                    image_url TEXT,
+                    created_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_deleted BOOLEAN DEFAULT FALSE
+                )''')
+    init_entity_index(c)
+    return conn
+
+
+def test_backfill_indexes_live_articles_and_drops_deleted_ones():
+    conn = make_db()
+    c = conn.cursor()
+    c.execute("INSERT INTO articles (id, user_id, entities) VALUES (1, 7, 'Austin, Roofing')")
+    c.execute("INSERT INTO articles (id, user_id, entities, is_deleted) VALUES (2, 7, 'Austin', TRUE)")
+    # Left behind by an article indexed before it was deleted
+    set_article_entities(c, 2, 7, ["Austin", "Plumbing"])
+    conn.commit()
+
+    backfill_entity_index(conn)
+
+    assert top_entities_for_user(c, 7) == [{"entity": "Austin", "article_count": 1},
+                                           {"entity": "Roofing", "article_count": 1}]
+    assert [article["id"] for article in articles_for_entity(c, 7, "Austin")] == [1]
+
+
+def make_app_db(path):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password TEXT NOT NULL)")
+    c.execute('''CREATE TABLE articles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    article TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    entities TEXT,
+                    image_url TEXT,
+                    meta_title TEXT,
+                    created_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_time_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_deleted BOOLEAN DEFAULT FALSE
+                )''')
+    init_article_storage(c)
+    init_entity_index(c)
+    c.execute("INSERT INTO users (username, password) VALUES ('writer', 'x')")
+    conn.commit()
+    return conn
+
+
+def indexed_entities(conn):
+    return sorted(row[0] for row in conn.execute("SELECT entity FROM article_entities"))
+
+
+def test_added_article_keeps_comma_entities_whole(tmp_path):
+    path = str(tmp_path / "users.db")
+    conn = make_app_db(path)
+    assert write_articles([("writer", "Roofing in Austin.", "Roofs", ENTITIES, None, None)], db_path=path) == 1
+
+    assert indexed_entities(conn) == sorted(ENTITIES)
+    # A later backfill leaves already indexed articles alone
+    backfill_entity_index(conn)
+    assert indexed_entities(conn) == sorted(ENTITIES)
+
+
+def test_edit_indexes_the_same_entities_as_add(tmp_path, monkeypatch):
+    main = pytest.importorskip("main")
+    from near_duplicates import SimHashIndex
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "near_duplicate_index", SimHashIndex(str(tmp_path / "users.simhash")))
+    conn = make_app_db("users.db")
+    write_articles([("writer", "Roofing in Austin.", "Roofs", ENTITIES, None, None)])
+    added = indexed_entities(conn)
+
+    assert main.update_article(1, 1, "Roofing in Austin.", "Roofs", ENTITIES)
+    assert indexed_entities(conn) == added == sorted(ENTITIES)
+    assert conn.execute("SELECT entities FROM articles WHERE id = 1").fetchone()[0] == ", ".join(ENTITIES)
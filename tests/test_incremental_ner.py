@@ -0,0 +1,48 @@
+import re
+from collections import Counter
+from types import SimpleNamespace
+
+from incremental_ner import ParagraphEntityCache, top_entities
+
+CAPITALIZED = re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)*")
+
+
+# Stand-in for spaCy: capitalized word runs are entities; records every pipe() batch
+class RecordingNLP:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, text):
+        return SimpleNamespace(ents=[SimpleNamespace(text=m.group()) for m in CAPITALIZED.finditer(text)])
+
+    def pipe(self, texts):
+        texts = list(texts)
+        self.batches.append(texts)
+        return [self(text) for text in texts]
+
+
+PARAGRAPHS = [
+    "Austin Roofing serves Travis County with Storm Repair and Austin Roofing crews.",
+    "Gutter Cleaning in Round Rock keeps Storm Repair costs down for Austin Roofing.",
+    "Shingle Supply from Georgetown Builders arrives weekly at Austin Roofing yards.",
+    "Customers in Cedar Park rate Storm Repair highly.",
+]
+
+
+def full_text_top(nlp, text):
+    return top_entities(Counter(ent.text for ent in nlp(text).ents))
+
+
+def test_edit_reruns_ner_on_changed_paragraph_only():
+    nlp = RecordingNLP()
+    cache = ParagraphEntityCache(nlp)
+    original = "\n\n".join(PARAGRAPHS)
+    assert top_entities(cache.count_entities(original)) == full_text_top(nlp, original)
+
+    edited_paragraph = "Customers in Cedar Park and Leander rate Storm Repair and Gutter Cleaning highly."
+    edited = "\n\n".join(PARAGRAPHS[:3] + [edited_paragraph])
+    nlp.batches.clear()
+
+    assert top_entities(cache.count_entities(edited)) == full_text_top(nlp, edited)
+    assert nlp.batches == [[edited_paragraph]]
+    assert cache.stats()["hits"] == 3
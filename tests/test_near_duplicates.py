@@ -0,0 +1,34 @@
+from near_duplicates import RECORD, SimHashIndex
+
+TEXT = " ".join(f"local roofing guide covers shingles gutters and repairs in section {i}" for i in range(40))
+
+
+def test_log_replays_adds_and_removes(tmp_path):
+    path = str(tmp_path / "users.simhash")
+    index = SimHashIndex(path)
+    index.add_many([(1, 7, TEXT), (2, 7, TEXT + " extra closing line"), (3, 8, TEXT)])
+    index.remove(2)
+
+    reloaded = SimHashIndex(path)
+    assert reloaded.article_ids() == {1, 3}
+    assert [article_id for article_id, _ in reloaded.find(7, TEXT)] == [1]
+    assert [article_id for article_id, _ in reloaded.find(8, TEXT)] == [3]
+
+
+def test_compact_keeps_live_entries_and_shrinks_log(tmp_path):
+    path = tmp_path / "users.simhash"
+    index = SimHashIndex(str(path))
+    index.add_many([(1, 7, TEXT), (2, 7, TEXT + " extra closing line"), (3, 8, TEXT)])
+    for _ in range(5):
+        index.add(1, 7, TEXT + " edited")
+    index.remove(2)
+    before = path.stat().st_size
+
+    index.compact()
+
+    assert path.stat().st_size == 2 * RECORD.size < before
+    assert not (tmp_path / "users.simhash.tmp").exists()
+    reloaded = SimHashIndex(str(path))
+    assert reloaded.fingerprints == index.fingerprints
+    index.add(4, 8, TEXT)
+    assert SimHashIndex(str(path)).article_ids() == {1, 3, 4}
@@ -0,0 +1,42 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("flask")
+
+import profiling  # noqa: E402
+from router import BackendRouter  # noqa: E402
+
+
+def busy_backend(input_data):
+    start = time.time()
+    while time.time() - start < 0.2:
+        sum(range(1000))
+    return "article"
+
+
+def run_routed(capture):
+    router = BackendRouter({"gpt": profiling.follow(busy_backend), "perplexity": profiling.follow(busy_backend)})
+    profiling._active_capture.set(capture)
+    capture.start()
+    try:
+        router.generate({}, "gpt", {"hedge": False})
+    finally:
+        profiling._active_capture.set(None)
+        capture.stop()
+
+
+def test_sampler_follows_router_worker_threads():
+    sampler = profiling.StackSampler([threading.get_ident()])
+    run_routed(sampler)
+    assert any("busy_backend" in stack for stack in sampler.counts)
+
+
+def test_cprofile_capture_writes_worker_stacks(tmp_path):
+    assert profiling._cprofile_lock.acquire(blocking=False)
+    capture = profiling.CProfileCapture()
+    run_routed(capture)
+    capture.dump(str(tmp_path / "request.prof"))
+    assert (tmp_path / "request.prof").exists()
+    assert "busy_backend" in (tmp_path / "request-workers.folded").read_text()
@@ -0,0 +1,49 @@
+from prompt_layout import build_article_messages, flatten_messages, prompt_prefix
+
+SETTINGS = {
+    "language": "English",
+    "article_size": "medium",
+    "tone_of_voice": "Custom",
+    "custom_tone_data": " ".join(f"Our {{brand}} voice is warm and direct, sample {i}." for i in range(400)),
+    "point_of_view": "second person",
+    "target_country": "United States",
+    "target_state": "Texas",
+    "target_city_zip": "Austin {78701}",
+    "toc": True,
+    "quotes": True,
+    "model": "gpt",
+}
+
+ROWS = [
+    {"main_keyword": "plumbing", "title": "Fixing {leaks} fast", "key_words": "pipes, {valves}"},
+    {"main_keyword": "roofing {pro}", "title": "Roof care", "key_words": "shingles"},
+    {"main_keyword": "hvac", "title": "{{Heating}} basics", "key_words": "{0}, {}, %s"},
+]
+
+
+def reference_for(i):
+    return " ".join(f"Row {i} reference sentence {n} about {{service}} pricing and local demand." for n in range(2000))
+
+
+def build(i, row):
+    return build_article_messages({**SETTINGS, **row}, reference_for(i))
+
+
+def test_prefix_is_byte_identical_across_rows():
+    prefixes = [build(i, row)[0]["content"].encode("utf-8") for i, row in enumerate(ROWS)]
+    assert len(set(prefixes)) == 1
+    assert prefixes[0] == prompt_prefix(SETTINGS).encode("utf-8")
+
+
+def test_row_values_only_appear_after_prefix():
+    for i, row in enumerate(ROWS):
+        system, user = build(i, row)
+        assert row["title"] not in system["content"]
+        assert row["title"] in user["content"]
+        assert f"Row {i} reference" in user["content"]
+
+
+def test_flattened_prompt_starts_with_shared_prefix():
+    prefix = prompt_prefix(SETTINGS)
+    for i, row in enumerate(ROWS):
+        assert flatten_messages(build(i, row)).startswith(prefix)
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from router import AsyncBackendRouter, BackendRouter, new_batch
+
+
+def counting_backends(slow_s):
+    calls = {"gpt": 0, "perplexity": 0}
+    lock = threading.Lock()
+
+    def backend(name, delay):
+        def call(input_data):
+            with lock:
+                calls[name] += 1
+            time.sleep(delay)
+            return name
+        return call
+
+    return {"gpt": backend("gpt", slow_s), "perplexity": backend("perplexity", 0.01)}, calls
+
+
+def test_concurrent_rows_respect_batch_hedge_cap():
+    backends, calls = counting_backends(0.3)
+    router = BackendRouter(backends, max_workers=32)
+    policy = {"hedge_delay_ms": 10, "max_hedge_ratio": 1.0, "max_hedges_per_batch": 2}
+    batch = new_batch()
+
+    with ThreadPoolExecutor(max_workers=12) as rows:
+        results = list(rows.map(lambda i: router.generate({"row": i}, "gpt", policy, batch), range(12)))
+
+    assert len(results) == 12
+    assert batch["hedges"] == 2
+    assert calls["perplexity"] == 2
+
+
+def test_queue_time_does_not_trigger_hedges():
+    backends, calls = counting_backends(0.2)
+    # One worker: the second row waits 0.2s in the queue before its call starts
+    router = BackendRouter(backends, max_workers=1)
+    policy = {"hedge_delay_ms": 350, "max_hedge_ratio": 1.0}
+    batch = new_batch()
+
+    with ThreadPoolExecutor(max_workers=2) as rows:
+        results = list(rows.map(lambda i: router.generate({"row": i}, "gpt", policy, batch), range(2)))
+
+    assert [result[1] for result in results] == ["gpt", "gpt"]
+    assert batch["hedges"] == 0
+    assert calls["perplexity"] == 0
+
+
+def async_backends(delays, fail=()):
+    calls = {name: 0 for name in delays}
+    cancelled = []
+
+    def backend(name):
+        async def call(input_data):
+            calls[name] += 1
+            try:
+                await asyncio.sleep(delays[name])
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if name in fail:
+                raise RuntimeError(f"{name} failed")
+            return name
+        return call
+
+    return {name: backend(name) for name in delays}, calls, cancelled
+
+
+def test_async_router_runs_hundreds_of_rows_concurrently():
+    backends, calls, _ = async_backends({"gpt": 0.2, "perplexity": 0.2})
+    router = AsyncBackendRouter(backends)
+
+    async def run():
+        batch = new_batch()
+        return await asyncio.gather(*(router.generate({"row": i}, "gpt", {"hedge": False}, batch) for i in range(300)))
+
+    start = time.monotonic()
+    results = asyncio.run(run())
+    assert len(results) == 300
+    assert time.monotonic() - start < 2
+    assert calls == {"gpt": 300, "perplexity": 0}
+
+
+def test_async_router_hedges_within_batch_cap_and_cancels_losers():
+    backends, calls, cancelled = async_backends({"gpt": 0.5, "perplexity": 0.01})
+    router = AsyncBackendRouter(backends)
+    policy = {"hedge_delay_ms": 20, "max_hedge_ratio": 1.0, "max_hedges_per_batch": 3}
+
+    async def run():
+        batch = new_batch()
+        results = await asyncio.gather(*(router.generate({"row": i}, "gpt", policy, batch) for i in range(10)))
+        await asyncio.sleep(0)
+        return batch, results
+
+    batch, results = asyncio.run(run())
+    assert batch["hedges"] == 3
+    assert sorted(backend for _, backend in results) == ["gpt"] * 7 + ["perplexity"] * 3
+    assert cancelled == ["gpt"] * 3
+
+
+def test_async_router_fails_over_on_error():
+    backends, calls, _ = async_backends({"gpt": 0.01, "perplexity": 0.01}, fail={"gpt"})
+    router = AsyncBackendRouter(backends)
+
+    result, backend = asyncio.run(router.generate({}, "gpt", {"hedge": False}))
+    assert (result, backend) == ("perplexity", "perplexity")
+    assert router.stats["gpt"].snapshot()["samples"] == 1
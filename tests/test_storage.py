@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+import storage
+
+zstandard = pytest.importorskip("zstandard")
+
+
+def make_db(articles):
+    conn = sqlite3.connect(":memory:")
+    c = conn.cursor()
+    c.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY, article TEXT NOT NULL)")
+    storage.init_article_storage(c)
+    for i in range(articles):
+        text = f"Article {i} about local roofing, gutters and shingle repair in Austin. " * 20
+        c.execute("INSERT INTO articles (id, article) VALUES (?, '')", (i,))
+        storage.write_article_body(c, i, text)
+    conn.commit()
+    return conn
+
+
+def test_no_dictionary_below_minimum_samples():
+    conn = make_db(storage.DICT_MIN_SAMPLES - 1)
+    assert storage.ensure_compression_dictionary(conn) is None
+
+
+def test_dictionary_trained_once_and_used_for_new_writes():
+    conn = make_db(storage.DICT_MIN_SAMPLES + 10)
+    dict_id = storage.ensure_compression_dictionary(conn)
+    assert dict_id is not None
+    assert storage.ensure_compression_dictionary(conn) is None
+
+    c = conn.cursor()
+    storage.write_article_body(c, 0, "A rewritten body about roofing in Austin.")
+    c.execute("SELECT dict_id FROM article_bodies WHERE article_id = 0")
+    assert c.fetchone()[0] == dict_id
+    assert storage.read_article_body(c, 0) == "A rewritten body about roofing in Austin."
+    assert storage.read_article_body(c, 1).startswith("Article 1 about")
+
+
+def test_dictionary_cache_is_scoped_to_database(tmp_path):
+    databases = []
+    for name, phrase in (("a.db", "roofing in Austin"), ("b.db", "gardening in Boston")):
+        conn = sqlite3.connect(str(tmp_path / name))
+        c = conn.cursor()
+        c.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY, article TEXT NOT NULL)")
+        storage.init_article_storage(c)
+        for i in range(storage.DICT_MIN_SAMPLES + 10):
+            storage.write_article_body(c, i, f"Article {i} about {phrase} and seasonal upkeep. " * 20)
+        conn.commit()
+        assert storage.ensure_compression_dictionary(conn) == 1
+        databases.append((conn, phrase))
+
+    # Both databases have a dictionary with id 1; each must use its own
+    for conn, phrase in databases:
+        c = conn.cursor()
+        storage.write_article_body(c, 0, f"New article about {phrase}.")
+        assert storage.read_article_body(c, 0) == f"New article about {phrase}."
+    for conn, phrase in reversed(databases):
+        c = conn.cursor()
+        assert storage.read_article_body(c, 0) == f"New article about {phrase}."
@@ -0,0 +1,64 @@
+import types
+
+import pytest
+
+import token_budget
+from token_budget import count_tokens, fit_to_budget, split_sentences
+
+
+def test_text_under_budget_is_unchanged():
+    text = "Local SEO helps small businesses. It brings nearby customers."
+    assert fit_to_budget(text, 600) == text
+
+
+def test_long_reference_fits_budget():
+    text = " ".join(f"Sentence {i} covers local search ranking for small businesses." for i in range(500))
+    result = fit_to_budget(text, 100, "local search")
+    assert 0 < count_tokens(result) <= 100
+
+
+def test_cjk_text_fits_budget():
+    text = "".join(f"これは日本語の参照テキスト{i}です。検索エンジン最適化について説明します！" for i in range(200))
+    assert count_tokens(text) > 600
+    result = fit_to_budget(text, 600)
+    assert 0 < count_tokens(result) <= 600
+
+
+@pytest.mark.parametrize("text", ["a" * 10000, "あ" * 10000, "word " * 5000])
+def test_text_without_sentence_boundaries_fits_budget(text):
+    assert count_tokens(fit_to_budget(text, 10)) <= 10
+
+
+def test_cjk_sentence_split():
+    assert split_sentences("Hi there. 日本。テスト！ok?") == ["Hi there.", "日本。", "テスト！", "ok?"]
+
+
+def test_failed_encoding_download_falls_back_once(monkeypatch):
+    calls = []
+
+    def get_encoding(name):
+        calls.append(name)
+        raise OSError("download failed")
+
+    monkeypatch.setattr(token_budget, "tiktoken", types.SimpleNamespace(get_encoding=get_encoding))
+    token_budget._encoding.cache_clear()
+    try:
+        assert count_tokens("abcdefgh") == 2
+        assert count_tokens("abcd") == 1
+        assert calls == ["o200k_base", "cl100k_base"]
+    finally:
+        token_budget._encoding.cache_clear()
+
+
+@pytest.mark.parametrize("token_budgets", ["600", 5, [600], {"reference": "abc"}, {"reference": "1e3"},
+                                           {"toneSample": -1}, {"guidelines": True}, {"reference": 10 ** 9}])
+def test_invalid_token_budgets_are_rejected_and_ignored(token_budgets):
+    assert token_budget.token_budgets_error(token_budgets)
+    assert token_budget.budgets_for({"token_budgets": token_budgets}) == token_budget.DEFAULT_BUDGETS
+
+
+def test_valid_token_budgets_override_defaults():
+    token_budgets = {"reference": "800", "toneSample": 200.0, "guidelines": None}
+    assert token_budget.token_budgets_error(token_budgets) is None
+    assert token_budget.budgets_for({"token_budgets": token_budgets}) == {
+        **token_budget.DEFAULT_BUDGETS, "reference": 800, "tone_sample": 200}
@@ -0,0 +1,163 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character-based estimate
+    tiktoken = None
+
+# Default per-section token allowances, overridable per request via settings.tokenBudgets
+DEFAULT_BUDGETS = {
+    "reference": int(os.getenv("REFERENCE_TOKEN_BUDGET", "600")),
+    "tone_sample": int(os.getenv("TONE_SAMPLE_TOKEN_BUDGET", "400")),
+    "guidelines": int(os.getenv("GUIDELINES_TOKEN_BUDGET", "500")),
+}
+
+# Raw page text kept before budgeting, so parsing huge pages stays bounded
+MAX_SOURCE_CHARS = 50000
+
+# Latin sentence ends need trailing whitespace; CJK full stops end a sentence directly
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])\s*")
+WORD = re.compile(r"[\w']+")
+STOPWORDS = set("""a an the and or but if then else of to in on at by for with from as is are was were be been
+being it its this that these those i you he she we they them his her our your their not no so do does did
+have has had will would can could should may might must about into over than too very just also""".split())
+
+
+# Loaded once; if tiktoken is missing or its BPE download fails, the character
+# estimate is used for the life of the process instead of retrying every call
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    for name in ("o200k_base", "cl100k_base"):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception:
+            continue
+    return None
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Hard cut to at most budget tokens, for text with no usable sentence boundaries
+def truncate_to_tokens(text, budget):
+    if budget <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:budget * 4]
+    tokens = encoding.encode(text, disallowed_special=())[:budget]
+    result = encoding.decode(tokens)
+    # A cut inside a multi-byte character can decode to text that re-encodes longer
+    while tokens and count_tokens(result) > budget:
+        tokens = tokens[:-1]
+        result = encoding.decode(tokens)
+    return result
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_SPLIT.split(" ".join(text.split())) if s.strip()]
+
+
+# Rank sentences by content-word frequency, query overlap and position, then keep the
+# best ones that fit the budget, restored to their original order
+@lru_cache(maxsize=256)
+def _summarize(text, budget, query):
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+
+    sentence_words = [[w for w in WORD.findall(s.lower()) if w not in STOPWORDS] for s in sentences]
+    frequency = Counter(w for words in sentence_words for w in words)
+    top = max(frequency.values()) if frequency else 1
+    query_words = {w for w in WORD.findall(query.lower()) if w not in STOPWORDS}
+
+    scored = []
+    for index, (sentence, words) in enumerate(zip(sentences, sentence_words)):
+        if not words:
+            continue
+        score = sum(frequency[w] / top for w in words) / (len(words) ** 0.5)
+        score += 0.5 * len(query_words.intersection(words))
+        score += 0.3 / (1 + index)
+        scored.append((score, index))
+
+    chosen = []
+    used = 0
+    for score, index in sorted(scored, reverse=True):
+        cost = count_tokens(sentences[index]) + 1
+        if used + cost > budget:
+            continue
+        chosen.append(index)
+        used += cost
+
+    if not chosen:
+        # A single sentence larger than the whole budget: keep its leading tokens
+        return truncate_to_tokens(sentences[scored[0][1] if scored else 0], budget)
+    result = " ".join(sentences[i] for i in sorted(chosen))
+    # Joining can tokenize differently from the per-sentence counts
+    if count_tokens(result) > budget:
+        result = truncate_to_tokens(result, budget)
+    return result
+
+
+# Compress text to fit within budget tokens; text already under budget is returned as is
+def fit_to_budget(text, budget, query=""):
+    if not text or budget <= 0:
+        return ""
+    text = text[:MAX_SOURCE_CHARS]
+    if count_tokens(text) <= budget:
+        return text
+    return _summarize(text, budget, query)
+
+
+BUDGET_SETTINGS = (("reference", "reference"), ("tone_sample", "toneSample"), ("guidelines", "guidelines"))
+MAX_BUDGET = 100000
+
+
+# A non-negative whole number of tokens, or None if the value is not one
+def _budget_value(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, int) and 0 <= value <= MAX_BUDGET:
+        return value
+    return None
+
+
+# Error message for an invalid settings.tokenBudgets, or None when it is usable
+def token_budgets_error(token_budgets):
+    if token_budgets is None:
+        return None
+    if not isinstance(token_budgets, dict):
+        return "tokenBudgets must be an object"
+    for _, setting in BUDGET_SETTINGS:
+        value = token_budgets.get(setting)
+        if value is not None and _budget_value(value) is None:
+            return f"tokenBudgets.{setting} must be a whole number between 0 and {MAX_BUDGET}"
+    return None
+
+
+# Per-section budgets for a row; values that fail validation fall back to the defaults
+def budgets_for(input_data):
+    budgets = dict(DEFAULT_BUDGETS)
+    overrides = input_data.get("token_budgets")
+    if not isinstance(overrides, dict):
+        return budgets
+    for key, setting in BUDGET_SETTINGS:
+        value = _budget_value(overrides.get(setting))
+        if value is not None:
+            budgets[key] = value
+    return budgets